@@ -1,11 +1,8 @@
 # 1. Python 標準庫 (Standard Library)
-import base64
 from datetime import datetime, timedelta
 import io
-from io import BytesIO
 import math
 import os
-import sqlite3
 
 # 2. 第三方套件 (Third-Party Packages)
 from flask import (
@@ -16,21 +13,28 @@ from flask import (
     abort, 
     redirect, 
     url_for, 
-    session
+    session,
+    g
 )
 from flask_login import LoginManager, login_required, current_user
-import gspread
-from google.oauth2.service_account import Credentials
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from matplotlib.font_manager import FontProperties
-import pandas as pd
 import requests
 
 # 3. 本地自訂模組 (Local Application Imports)
-from modules.gsheet import client, SHEET_ID
+from modules.sheet_sync import sheet_mirror
+from modules.audit_log import login_audit
+from modules.sc_check import sc_disk_table
+from modules.sheet_tail import SheetTail
+from modules.sheet_pager import SheetPager
 from modules.billing import billing_bp, User
+from modules.db import get_db, init_app as init_db_app
+from modules.workbook import LocalWorkbook, WorkbookSource, sheet_version
+from modules.search_index import NgramIndex, is_plain_text
+from modules.page_cache import cached_page
+from modules.lazy import LazyObject, lazy_import
+
+# pandas / gspread 於第一次使用時才載入，/login、/countpass 等頁面不需等待
+pd = lazy_import('pandas')
+gspread = lazy_import('gspread')
 
 # 取得當前 app.py 所在的目錄，並指到 billing.db
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -43,9 +47,8 @@ app.secret_key = os.environ.get('SECRET_KEY', 'your_default_secret_key_here')  #
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=10)
 
 GITHUB_XLSX_URL = 'https://raw.githubusercontent.com/Yang-0419-di/FW_2/master/data.xlsx'
-cached_xls = None
-version_time = None
-app.config['VERSION_TIME'] = version_time
+WORKBOOK_REFRESH_SECONDS = int(os.environ.get('WORKBOOK_REFRESH_SECONDS', 60))
+app.config['VERSION_TIME'] = None
 
 # ====== 初始化 Flask-Login ======
 login_manager = LoginManager()
@@ -54,11 +57,9 @@ login_manager.login_view = 'billing.login'  # 未登入時自動重定向之登
 
 @login_manager.user_loader
 def load_user(user_id):
-    conn = sqlite3.connect('billing.db')
-    cursor = conn.cursor()
+    cursor = get_db().cursor()
     cursor.execute('SELECT id, username FROM users WHERE id = ?', (user_id,))
     user_row = cursor.fetchone()
-    conn.close()
     
     if user_row:
         return User(id=user_row[0], username=user_row[1])
@@ -67,44 +68,93 @@ def load_user(user_id):
 # ====== 註冊 billing 藍圖 ======
 app.register_blueprint(billing_bp)
 
-# ====== 字型設定（支援中文） ======
-matplotlib.rcParams['font.sans-serif'] = ['Microsoft JhengHei']
-matplotlib.rcParams['axes.unicode_minus'] = False
+# ====== billing.db 連線：每個請求共用一條，結束時歸還執行緒連線池 ======
+init_db_app(app)
+
+# ====== 字型設定（支援中文）；matplotlib 於第一次繪圖時才載入 ======
+def _load_pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    matplotlib.rcParams['font.sans-serif'] = ['Microsoft JhengHei']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    import matplotlib.pyplot as plt
+    return plt
+
+plt = LazyObject(_load_pyplot)
 font_path = "./fonts/NotoSansCJKtc-Regular.otf"
-font_prop = FontProperties(fname=font_path)
 
 # ====== 載入 Excel（含版本號） ======
+def _on_workbook_load(snapshot):
+    snapshot.version = sheet_version(snapshot)
+    app.config['VERSION_TIME'] = snapshot.version
+
+data_source = WorkbookSource(
+    GITHUB_XLSX_URL,
+    timeout=5,
+    interval=WORKBOOK_REFRESH_SECONDS,
+    on_load=_on_workbook_load
+)
+data_source.start_refresher()  # worker 啟動即在背景下載，首個請求不必等待網路
+
+@app.before_request
+def start_background_sync():
+    # 每個 worker 行程處理第一個請求時才啟動（匯入時不授權 Google Sheets；gunicorn --preload fork 後各自啟動）
+    sheet_mirror.start()           # Google Sheet 分頁背景同步到 billing.db
+    login_audit.start()            # 送出上次未送完的登入日誌
+
+# 同一請求只取一次快照並記在 g：cached_page 的快取鍵 / ETag 與頁面內容、頁首版本都來自同一份，
+# 背景執行緒在請求途中換上新版本也不會把新內容存到舊版本的鍵下
+def current_snapshot():
+    if g.get('workbook') is None:
+        g.workbook = data_source.snapshot
+    return g.workbook
+
 def load_excel_from_github(url):
-    global cached_xls, version_time
-    if cached_xls:
-        return cached_xls
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return snapshot
     try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            excel_bytes = BytesIO(response.content)
-            cached_xls = pd.ExcelFile(excel_bytes, engine='openpyxl')
-            df_version = pd.read_excel(cached_xls, sheet_name='首頁', header=None, usecols="G", nrows=1)
-            version_time = str(df_version.iat[0, 0]) if not pd.isna(df_version.iat[0, 0]) else "無版本資訊"
-            app.config['VERSION_TIME'] = version_time
-            return cached_xls
+        g.workbook = data_source.get()
+        return g.workbook
     except Exception as e:
         print(f"❌ Excel 下載失敗: {e}")
     abort(500, description="⚠️ 無發從 GitHub 載入 Excel 檔案")
 
+def current_version():
+    snapshot = current_snapshot()
+    return snapshot.version if snapshot is not None else None
+
+MFP_XLSX_PATH = "MFP/MFP.xlsx"
+mfp_local = LocalWorkbook(MFP_XLSX_PATH)
+# TIME_CHART_MODE=client 時 /time 改由瀏覽器依 /time/chart.json 繪圖
+TIME_CHART_CLIENT = os.environ.get('TIME_CHART_MODE', 'image') == 'client'
+
+def mfp_workbook():
+    """本次請求使用的 MFP.xlsx 快照（同 current_snapshot，同一請求只讀一次）"""
+    if 'mfp_workbook' not in g:
+        g.mfp_workbook = mfp_local.get()
+    return g.mfp_workbook
+
+def mfp_file_version():
+    """本機 MFP.xlsx 頁面的快取版本：檔案內容雜湊，頁首同時顯示 GitHub 工作簿版本"""
+    version = current_version()
+    if version is None:
+        return None
+    try:
+        return version, mfp_workbook().version
+    except OSError:
+        return None
+
 def clean_df(df):
     df.columns = df.columns.astype(str).str.replace('\n', '', regex=False)
     return df.fillna('')
 
-# ====== 首頁路由 ======
-@app.route('/')
-@login_required
-def home():
-    xls = load_excel_from_github(GITHUB_XLSX_URL)
-
-    # SC硬碟檢測：資料篩選與 Google Sheet 串接
+# ====== SC硬碟檢測（Google Sheet 即時資料，與首頁快取分開載入） ======
+def load_sc_disk_data(xls):
+    """IM 當月硬碟更換紀錄併入「硬碟檢測」分頁填寫值，最多 5 筆"""
     sc_disk_data = []
     try:
-        df_im = clean_df(pd.read_excel(xls, sheet_name='IM'))
+        df_im = clean_df(xls.read_excel(sheet_name='IM'))
 
         # 1. 條件一：報修類別為 HL-TM主機 或 HL-SC主機
         cond_category = df_im['報修類別'].astype(str).isin(['HL-TM主機', 'HL-SC主機'])
@@ -135,9 +185,7 @@ def home():
 
         # 4. 從 Google Sheet「硬碟檢測」分頁讀取填寫紀錄
         try:
-            sh = client.open_by_key(SHEET_ID)
-            ws_disk = sh.worksheet("硬碟檢測")
-            gs_df = pd.DataFrame(ws_disk.get_all_records())
+            gs_df = pd.DataFrame(sc_disk_table.records())
         except Exception:
             gs_df = pd.DataFrame()
 
@@ -173,15 +221,38 @@ def home():
     except Exception as e:
         print(f"⚠️ SC硬碟檢測載入失敗: {e}")
 
-    # 首頁其他表格處理
-    df_department = clean_df(pd.read_excel(xls, sheet_name='首頁', usecols="A:E", skiprows=4, nrows=1))
-    df_seasons = clean_df(pd.read_excel(xls, sheet_name='首頁', usecols="A:D", skiprows=8, nrows=2))
-    df_project1 = clean_df(pd.read_excel(xls, sheet_name='首頁', usecols="A:E", skiprows=12, nrows=5))
+    return sc_disk_data
+
+@app.route('/sc_disk/rows')
+@login_required
+def sc_disk_rows():
+    xls = load_excel_from_github(GITHUB_XLSX_URL)
+    return render_template('sc_disk_rows.html', sc_disk_data=load_sc_disk_data(xls))
+
+# ====== 首頁路由 ======
+@app.route('/')
+@login_required
+@cached_page(current_version)
+def home():
+    xls = load_excel_from_github(GITHUB_XLSX_URL)
+
+    # 首頁其他表格處理：'首頁' 各區塊一次從同一份解碼結果切出
+    blocks = xls.read_ranges('首頁', {
+        'department': 'A5:E6',
+        'seasons': 'A9:D11',
+        'project1': 'A13:E18',
+        'HUB_top': ('A21:C22', False),
+        'HUB': 'A23:E',
+        'area1': ('E57:K59', False),
+        'area2': ('E61:P63', False),
+        'area3': ('E65:L67', False),
+    })
+    df_department = clean_df(blocks['department'])
+    df_seasons = clean_df(blocks['seasons'])
+    df_project1 = clean_df(blocks['project1'])
 
     # HUB 前段統計
-    df_HUB_top_raw = pd.read_excel(
-        xls, sheet_name='首頁', header=None, usecols="A:C", skiprows=20, nrows=2
-    )
+    df_HUB_top_raw = blocks['HUB_top']
     df_HUB_top_raw.columns = df_HUB_top_raw.iloc[0].str.strip()
     df_HUB_top = df_HUB_top_raw[1:]
 
@@ -199,12 +270,13 @@ def home():
             .astype(str) + '%'
         )
 
-    df_HUB = clean_df(pd.read_excel(xls, sheet_name='首頁', header=22, usecols="A:E"))
+    df_HUB = clean_df(blocks['HUB'])
     df_HUB = df_HUB[df_HUB['門市編號'].astype(str).str.strip() != '']
     df_HUB['門市編號'] = df_HUB['門市編號'].astype(str).str.replace(r'\.0$', '', regex=True)
     df_HUB = df_HUB[['門市編號', '門市名稱', 'HUB規格', '異常原因', '完工確認']]
 
-    df = clean_df(pd.read_excel(xls, sheet_name=0, header=20, nrows=500, usecols="A:O"))
+    # 第一個分頁（門市主檔）第 21 列為欄名，最多 500 筆
+    df = clean_df(xls.read_range(0, 'A21:O521'))
     df = df[['門市編號', '門市名稱', 'PMQ_檢核', '專案檢核', 'HUB', '完工檢核']]
 
     keyword = request.args.get('keyword', '').strip()
@@ -214,22 +286,21 @@ def home():
         no_data_found = df.empty
 
     # 區域數量（三段）
-    df1 = pd.read_excel(xls, sheet_name='首頁', header=None, usecols="E:K", skiprows=56, nrows=3)
+    df1 = blocks['area1']
     headers1 = df1.iloc[0].tolist()
     area_table_1 = [dict(zip(headers1, df1.iloc[i].tolist())) for i in range(1, 3)]
 
-    df2 = pd.read_excel(xls, sheet_name='首頁', header=None, usecols="E:P", skiprows=60, nrows=3)
+    df2 = blocks['area2']
     headers2 = df2.iloc[0].tolist()
     area_table_2 = [dict(zip(headers2, df2.iloc[i].tolist())) for i in range(1, 3)]
 
-    df3 = pd.read_excel(xls, sheet_name='首頁', header=None, usecols="E:L", skiprows=64, nrows=3)
+    df3 = blocks['area3']
     headers3 = df3.iloc[0].tolist()
     area_table_3 = [dict(zip(headers3, df3.iloc[i].tolist())) for i in range(1, 3)]
 
     return render_template(
         'home.html',
-        version=version_time,
-        sc_disk_data=sc_disk_data,
+        version=xls.version,
         area_table_1=area_table_1,
         area_table_2=area_table_2,
         area_table_3=area_table_3,
@@ -245,31 +316,39 @@ def home():
         home_page=True
     )
 
+DISK_TOTAL_KEYS = [
+    'sc_128_new','sc_128_old','sc_240_new','sc_240_old',
+    'sc_256_new','sc_256_old','sc_500_new','sc_500_old',
+    'sc_1t_new','sc_1t_old','tm_128_new','tm_128_old','tm_256_new','tm_256_old'
+]
+
+def fold_disk_rows(state, records):
+    """ 併入「硬碟統計」新增的列：每位 user 只保留最後一列，total 隨之增減 """
+    latest = dict(state['latest']) if state else {}
+    total = dict(state['total']) if state else {k: 0 for k in DISK_TOTAL_KEYS}
+    for row in records:
+        user = row.get('user')
+        if not user:
+            continue
+        old = latest.get(user)
+        for k in DISK_TOTAL_KEYS:
+            total[k] += int(row.get(k) or 0) - (int(old.get(k) or 0) if old else 0)
+        latest[user] = row
+    return {'latest': latest, 'total': total}
+
+disk_tail = SheetTail("硬碟統計", fold_disk_rows)
+log_pager = SheetPager("log")
+
 @app.route("/disk", methods=["GET"])
 @login_required
 def disk_page():
     try:
-        sh = client.open_by_key(SHEET_ID)
-        sheet = sh.worksheet("硬碟統計")
+        state = disk_tail.state()
     except gspread.exceptions.APIError as e:
         return f"⚠️ 無法讀取 Google Sheet: {e}", 500
 
-    all_rows = sheet.get_all_records()
-
-    latest_data = {}
-    for row in all_rows:
-        user = row.get('user')
-        if user:
-            latest_data[user] = row
-
-    rows = list(latest_data.values())
-
-    total_keys = [
-        'sc_128_new','sc_128_old','sc_240_new','sc_240_old',
-        'sc_256_new','sc_256_old','sc_500_new','sc_500_old',
-        'sc_1t_new','sc_1t_old','tm_128_new','tm_128_old','tm_256_new','tm_256_old'
-    ]
-    total = {k: sum(int(r.get(k) or 0) for r in rows) for k in total_keys}
+    rows = list(state['latest'].values())
+    total = dict(state['total'])
 
     return render_template("disk.html", page_header="POS 相關", rows=rows, total=total)
 
@@ -298,8 +377,6 @@ def disk_save():
         return "⚠️ 必須選擇使用者", 400
 
     try:
-        sh = client.open_by_key(SHEET_ID)
-        sheet = sh.worksheet("硬碟統計")
         row = [
             data["user"], data["sc_128_new"], data["sc_128_old"],
             data["sc_240_new"], data["sc_240_old"],
@@ -309,7 +386,8 @@ def disk_save():
             data["tm_128_new"], data["tm_128_old"],
             data["tm_256_new"], data["tm_256_old"]
         ]
-        sheet.append_row(row)
+        sheet_mirror.append("硬碟統計", row)
+        disk_tail.expire()
     except gspread.exceptions.APIError as e:
         return f"⚠️ 無法寫入 Google Sheet: {e}", 500
 
@@ -320,12 +398,13 @@ def disk_save():
 def countpass():
     return render_template('countpass.html', 
                            page_header="POS 相關",
-                           version=version_time, 
+                           version=current_version(), 
                            home_page=False, 
                            billing_invoice_log=False)
 
 @app.route('/personal/<name>')
 @login_required
+@cached_page(current_version)
 def personal(name):
     sheet_map = {'吳宗鴻': '吳宗鴻', '湯家瑋': '湯家瑋', '狄澤洋': '狄澤洋','劉柏均': '劉柏均'}
     sheet_name = sheet_map.get(name)
@@ -334,13 +413,12 @@ def personal(name):
 
     xls = load_excel_from_github(GITHUB_XLSX_URL)
 
-    df_top = clean_df(pd.read_excel(xls, sheet_name=sheet_name, usecols="A:G", nrows=5))
-    df_project = clean_df(pd.read_excel(xls, sheet_name=sheet_name, usecols="H:L", nrows=5))
-    df_bottom = clean_df(pd.read_excel(xls, sheet_name=sheet_name, usecols="A:K", skiprows=6))
-    df_ads = clean_df(pd.read_excel(xls, sheet_name=sheet_name, usecols="A,B,S", skiprows=6))
+    df_top = clean_df(xls.read_excel(sheet_name=sheet_name, usecols="A:G", nrows=5))
+    df_project = clean_df(xls.read_excel(sheet_name=sheet_name, usecols="H:L", nrows=5))
+    df_bottom = clean_df(xls.read_excel(sheet_name=sheet_name, usecols="A:K", skiprows=6))
+    df_ads = clean_df(xls.read_excel(sheet_name=sheet_name, usecols="A,B,S", skiprows=6))
 
-    df_area = pd.read_excel(
-        xls,
+    df_area = xls.read_excel(
         sheet_name=sheet_name,
         usecols="W:AE",
         nrows=1,
@@ -351,8 +429,7 @@ def personal(name):
         lambda x: "-" if str(x).strip().startswith("-") else str(x)
     )
 
-    df_unfinished = pd.read_excel(
-        xls,
+    df_unfinished = xls.read_excel(
         sheet_name="未完工清單",
         usecols="A:K"
     )
@@ -383,17 +460,61 @@ def personal(name):
         tables_bottom=df_bottom.to_dict(orient="records"),
         tables_ads=df_ads.to_dict(orient="records"),
         tables_area=df_area.to_dict(orient="records"),
-        version=version_time,
+        version=current_version(),
         billing_invoice_log=False,
         home_page=False
     )
 
+REPORT_COLUMNS = ['案件類別', '門店編號', '門店名稱', '報修時間', '報修類別', '報修項目', '報修說明', '設備號碼', '服務人員', '工作內容']
+
+def build_report_index(snapshot):
+    """ 每個活頁簿版本建立一次：IM 顯示欄位的 n-gram 索引、門店編號索引與報修類別雜湊索引 """
+    df = clean_df(snapshot.read_excel(sheet_name='IM'))
+    df = df[REPORT_COLUMNS]
+    # 與 df.apply(lambda r: r.astype(str)...) 相同的逐格字串
+    cells = [[str(v) for v in row] for row in df.astype(object).itertuples(index=False)]
+    category_index = {}
+    for i, row in enumerate(cells):
+        category_index.setdefault(row[REPORT_COLUMNS.index('報修類別')].strip(), []).append(i)
+    return {
+        'df': df,
+        'records': df.to_dict(orient='records'),
+        'keyword': NgramIndex(cells),
+        'store_id': NgramIndex([[row[REPORT_COLUMNS.index('門店編號')]] for row in cells]),
+        'repair_item': category_index,
+    }
+
+def search_report(index, keyword, store_id, repair_item):
+    """ 以索引取交集；關鍵字含正規表示式字元時退回原本的逐列比對 """
+    df = index['df']
+    row_ids = None
+
+    def narrow(ids):
+        nonlocal row_ids
+        row_ids = set(ids) if row_ids is None else row_ids & set(ids)
+
+    if keyword:
+        if is_plain_text(keyword):
+            narrow(index['keyword'].search(keyword))
+        else:
+            mask = df.apply(lambda r: r.astype(str).str.contains(keyword, case=False).any(), axis=1)
+            narrow(i for i, hit in enumerate(mask) if hit)
+    if store_id:
+        if is_plain_text(store_id):
+            narrow(index['store_id'].search(store_id))
+        else:
+            mask = df['門店編號'].astype(str).str.contains(store_id, case=False)
+            narrow(i for i, hit in enumerate(mask) if hit)
+    if repair_item:
+        narrow(index['repair_item'].get(repair_item.strip(), []))
+
+    records = index['records']
+    return [records[i] for i in sorted(row_ids)]
+
 @app.route('/report')
 @login_required
 def report():
     xls = load_excel_from_github(GITHUB_XLSX_URL)
-    df = clean_df(pd.read_excel(xls, sheet_name='IM'))
-    df = df[['案件類別', '門店編號', '門店名稱', '報修時間', '報修類別', '報修項目', '報修說明', '設備號碼', '服務人員', '工作內容']]
     keyword = request.args.get('keyword', '').strip()
     store_id = request.args.get('store_id', '').strip()
     repair_item = request.args.get('repair_item', '').strip()
@@ -401,18 +522,13 @@ def report():
     tables = []
     
     if keyword or store_id or repair_item:
-        if keyword:
-            df = df[df.apply(lambda r: r.astype(str).str.contains(keyword, case=False).any(), axis=1)]
-        if store_id:
-            df = df[df['門店編號'].astype(str).str.contains(store_id, case=False)]
-        if repair_item:
-            df = df[df['報修類別'].astype(str).str.strip() == repair_item.strip()]
-        tables = df.to_dict(orient='records')
+        index = xls.derive('report_index', build_report_index)
+        tables = search_report(index, keyword, store_id, repair_item)
         
     return render_template(
         'report.html',
         page_header="POS 相關",
-        version=version_time,
+        version=current_version(),
         tables=tables,
         keyword=keyword,
         store_id=store_id,
@@ -428,7 +544,7 @@ def sm_web_page():
     return render_template(
         'sm_web.html',
         sm_web=True,
-        version=version_time,
+        version=current_version(),
         billing_invoice_log=False,
         home_page=False
     )
@@ -440,36 +556,20 @@ def inspection_log():
     if current_user.username != 'yang.di':
         abort(403)
 
-    logs = []
+    # --- 📄 分頁邏輯（只讀當頁範圍，總筆數來自快取的最後列號） ---
+    page = request.args.get('page', 1, type=int)  # 取得當前頁碼，預設為第 1 頁
+    per_page = 12                                  # 每頁顯示 12 筆
+    paginated_logs, total_pages, total_logs = [], 1, 0
     try:
-        sh = client.open_by_key(SHEET_ID)
-        ws = sh.worksheet("log")
-        logs = ws.get_all_records()
-        logs.reverse()  # 讓最新的登入紀錄排在前面
+        paginated_logs, page, total_pages, total_logs = log_pager.page(page, per_page)
     except Exception as e:
         print(f"⚠️ 檢視日誌載入失敗: {e}")
-
-    # --- 📄 分頁邏輯 ---
-    page = request.args.get('page', 1, type=int)  # 取得當前頁碼，預設為第 1 頁
-    per_page = 12                                  # 每頁顯示 12 筆
-    total_logs = len(logs)
-    total_pages = math.ceil(total_logs / per_page) if total_logs > 0 else 1
-
-    # 確保頁碼範圍正確
-    if page < 1:
         page = 1
-    elif page > total_pages:
-        page = total_pages
-
-    # 裁切當頁資料
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    paginated_logs = logs[start_idx:end_idx]
 
     return render_template(
         'inspection_log.html',
         page_header="檢視日誌",
-        version=version_time,
+        version=current_version(),
         logs=paginated_logs,       # 只傳送當頁的 12 筆資料
         page=page,                 # 當前頁碼
         total_pages=total_pages,   # 總頁數
@@ -478,74 +578,109 @@ def inspection_log():
         home_page=False
     )
 
+# ====== 出勤時間曲線圖（每個 MFP.xlsx 版本只繪製一次） ======
+def attendance_series(snapshot):
+    df_chart = snapshot.read_excel(sheet_name='出勤時間', header=None)
+    x = [str(v) for v in df_chart.iloc[13, 1:16].tolist()]
+    names = df_chart.iloc[14:18, 0].tolist()
+    y_data = df_chart.iloc[14:18, 1:16].values.tolist()
+    return x, names, y_data
+
+def render_attendance_chart(snapshot):
+    x, names, y_data = snapshot.derive('attendance_series', attendance_series)
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+
+    for i, y in enumerate(y_data):
+        ax.plot(x, y, marker='o', label=names[i])
+
+    ax.set_xlabel('日期')
+    ax.set_ylabel('時數')
+    ax.legend()
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+    img = io.BytesIO()
+    plt.savefig(img, format='png')
+    plt.close(fig)
+    return img.getvalue()
+
+def _json_number(v):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(v) else v
+
+def _versioned_response(resp, version):
+    resp.set_etag(version)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp.make_conditional(request)
+
+@app.route('/time/chart.png')
+@login_required
+def time_chart():
+    xls = mfp_local.get()
+    png = xls.derive('attendance_chart', render_attendance_chart)
+    return _versioned_response(app.response_class(png, mimetype='image/png'), xls.version)
+
+@app.route('/time/chart.json')
+@login_required
+def time_chart_data():
+    """ 提供原始數列給前端自行繪圖，伺服器端完全不經過 matplotlib """
+    xls = mfp_local.get()
+    x, names, y_data = xls.derive('attendance_series', attendance_series)
+    return _versioned_response(jsonify({
+        'labels': x,
+        'series': [
+            {'name': str(name), 'data': [_json_number(v) for v in y]}
+            for name, y in zip(names, y_data)
+        ]
+    }), xls.version)
+
 @app.route('/time')
 @login_required
+@cached_page(mfp_file_version)
 def time_page():
-    xls = pd.ExcelFile("MFP/MFP.xlsx")
+    xls = mfp_workbook()
 
-    df_summary = pd.read_excel(
-        xls,
+    df_summary = xls.read_excel(
         sheet_name='出勤時間',
         usecols="A:F",
         header=0,
         nrows=1
     )
 
-    detail_1 = pd.read_excel(
-        xls,
+    detail_1 = xls.read_excel(
         sheet_name='出勤時間',
         usecols="A:Q",
         header=3,
         nrows=4
     )
 
-    detail_2 = pd.read_excel(
-        xls,
+    detail_2 = xls.read_excel(
         sheet_name='出勤時間',
         usecols="A:Q",
         header=8,
         nrows=4
     )
 
-    detail_3 = pd.read_excel(
-        xls,
+    detail_3 = xls.read_excel(
         sheet_name='出勤時間',
         usecols="A:Q",
         header=13,
         nrows=4
     )
 
-    df_chart = pd.read_excel(xls, sheet_name='出勤時間', header=None)
-
-    x = [str(v) for v in df_chart.iloc[13, 1:16].tolist()]
-    names = df_chart.iloc[14:18, 0].tolist()
-    y_data = df_chart.iloc[14:18, 1:16].values.tolist()
-
-    fig, ax = plt.subplots(figsize=(10, 5))
-
-    for i, y in enumerate(y_data):
-        ax.plot(x, y, marker='o', label=names[i])
-
-    ax.set_xlabel('日期')
-    ax.set_ylabel('時數')
-    ax.legend()
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    plot_url = base64.b64encode(img.read()).decode('utf-8')
-    plt.close()
-
     return render_template(
         'time.html',
-        version=version_time,
+        version=current_version(),
         summary_table=df_summary.to_html(index=False, classes='dataframe'),
         detail_table_1=detail_1.to_html(index=False, classes='dataframe'),
         detail_table_2=detail_2.to_html(index=False, classes='dataframe'),
         detail_table_3=detail_3.to_html(index=False, classes='dataframe'),
-        plot_url=plot_url,
+        chart_version=xls.version,
+        chart_client=TIME_CHART_CLIENT,
         df_summary=df_summary,
         time_page=True,
         billing_invoice_log=False,
@@ -554,9 +689,10 @@ def time_page():
 
 @app.route('/mfp_parts', methods=['GET', 'POST'])
 @login_required
+@cached_page(current_version)
 def mfp_parts():
     xls = load_excel_from_github(GITHUB_XLSX_URL)
-    df = pd.read_excel(xls, sheet_name='MFP_零件表')
+    df = xls.read_excel(sheet_name='MFP_零件表')
     model = request.form.get('model', '')
     part = request.form.get('part', '')
     message = ""
@@ -576,7 +712,7 @@ def mfp_parts():
     return render_template(
         'mfp_parts.html',
         page_header="MFP 相關",
-        version=version_time,
+        version=current_version(),
         message=message,
         table_html=table_html,
         selected_model=model,
@@ -590,7 +726,7 @@ def mfp_parts():
 def calendar_page():
     return render_template(
         'calendar.html',
-        version=version_time,
+        version=current_version(),
         calendar_page=True
     )
 
@@ -599,7 +735,7 @@ def calendar_page():
 def calendar_events():
     try:
         xls = load_excel_from_github(GITHUB_XLSX_URL)
-        df = pd.read_excel(xls, sheet_name='行事曆')
+        df = xls.read_excel(sheet_name='行事曆')
     except:
         return jsonify([])
     df.columns = df.columns.str.strip()
@@ -627,11 +763,11 @@ def calendar_events():
 
 @app.route("/worktime")
 @login_required
+@cached_page(mfp_file_version)
 def worktime():
-    path = "MFP/MFP.xlsx"
+    xls = mfp_workbook()
 
-    df_1 = pd.read_excel(
-        path,
+    df_1 = xls.read_excel(
         sheet_name="工時計算",
         header=None,
         usecols="A:F",
@@ -641,8 +777,7 @@ def worktime():
     block1_header = df_1.iloc[0].tolist()
     block1_body = df_1.iloc[1:].values.tolist()
 
-    df_2 = pd.read_excel(
-        path,
+    df_2 = xls.read_excel(
         sheet_name="工時計算",
         header=None,
         usecols="A:J",
@@ -653,8 +788,7 @@ def worktime():
     block2_body = df_2.iloc[1:-1].values.tolist()
     block2_note = df_2.iloc[-1].tolist()
 
-    df_3 = pd.read_excel(
-        path,
+    df_3 = xls.read_excel(
         sheet_name="工時計算",
         header=None,
         usecols="A:H",
@@ -664,8 +798,7 @@ def worktime():
     block3_header = df_3.iloc[0].tolist()
     block3_body = df_3.iloc[1:].values.tolist()
 
-    df_4 = pd.read_excel(
-        path,
+    df_4 = xls.read_excel(
         sheet_name="工時計算",
         header=None,
         usecols="A:K",
@@ -693,54 +826,41 @@ def update_sc_disk():
     store_id = str(data.get('store_id', '')).strip()
 
     try:
-        sh = client.open_by_key(SHEET_ID)
-        ws = sh.worksheet("硬碟檢測")
-        records = ws.get_all_records()
-        
-        # 尋找目標列 (比對 門店編號)
-        row_idx = None
-        for idx, r in enumerate(records, start=2): # header 佔據第 1 列
-            if str(r.get('門店編號')).strip() == store_id:
-                row_idx = idx
-                break
-
         if action == 'delete':
             # 🚀 關鍵修改：刪除時，在 Google 試算表記錄「已刪除」狀態 (例如寫入 'DELETED' 或 註記)
             # 這樣後端讀取時才知道這筆被刪除了，不會再從 Excel 抓出來
-            row_data = [
-                data.get('leave_time', ''),
-                store_id,
-                data.get('store_name', ''),
-                data.get('repair_cat', ''),
-                data.get('work_content', ''),
-                'DELETED', # SC(1) 設為 DELETED 做為已刪除標記
-                'DELETED',
-                'DELETED',
-                'DELETED'
-            ]
-            if row_idx:
-                ws.update(f'A{row_idx}:I{row_idx}', [row_data])
-            else:
-                ws.append_row(row_data)
+            fields = {
+                '離場時間': data.get('leave_time', ''),
+                '門店編號': store_id,
+                '門店名稱': data.get('store_name', ''),
+                '報修類別': data.get('repair_cat', ''),
+                '工作內容': data.get('work_content', ''),
+                'SC(1)': 'DELETED',  # SC(1) 設為 DELETED 做為已刪除標記
+                'SC(2)': 'DELETED',
+                'TM(1)': 'DELETED',
+                'TM(2)': 'DELETED'
+            }
+            # 以 門店編號 找到既有列就依欄名覆寫（依索引直接定位），否則新增一列
+            if not sc_disk_table.update(store_id, fields, field='門店編號', value_input_option='RAW'):
+                sc_disk_table.append(None, fields)
                 
             return jsonify({'status': 'success', 'message': '已標記為刪除，頁面重新整理後將不再顯示'})
 
         elif action == 'save':
-            row_data = [
-                data.get('leave_time', ''),
-                store_id,
-                data.get('store_name', ''),
-                data.get('repair_cat', ''),
-                data.get('work_content', ''),
-                data.get('sc1', ''),
-                data.get('sc2', ''),
-                data.get('tm1', ''),
-                data.get('tm2', '')
-            ]
-            if row_idx:
-                ws.update(f'A{row_idx}:I{row_idx}', [row_data])
-            else:
-                ws.append_row(row_data)
+            fields = {
+                '離場時間': data.get('leave_time', ''),
+                '門店編號': store_id,
+                '門店名稱': data.get('store_name', ''),
+                '報修類別': data.get('repair_cat', ''),
+                '工作內容': data.get('work_content', ''),
+                'SC(1)': data.get('sc1', ''),
+                'SC(2)': data.get('sc2', ''),
+                'TM(1)': data.get('tm1', ''),
+                'TM(2)': data.get('tm2', '')
+            }
+            # 以 門店編號 找到既有列就依欄名覆寫（依索引直接定位），否則新增一列
+            if not sc_disk_table.update(store_id, fields, field='門店編號', value_input_option='RAW'):
+                sc_disk_table.append(None, fields)
                 
             return jsonify({'status': 'success', 'message': '資料已同步至 Google Sheet'})
 
@@ -0,0 +1,18 @@
+"""
+測試共用的 fixture：在 billing.db 的暫存複本上執行，不會動到專案內的 billing.db
+"""
+import os
+import shutil
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    """ billing.db 複本；工作目錄切到暫存資料夾，匯入 modules.billing 時的 init_db 不會動到原檔 """
+    path = tmp_path / "billing.db"
+    shutil.copy(os.path.join(REPO_DIR, "billing.db"), path)
+    monkeypatch.chdir(tmp_path)
+    return str(path)
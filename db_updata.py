@@ -1,17 +1,4 @@
-import sqlite3
+# billing.db 欄位 / 索引調整已改由 modules/migrations.py 依版本管理（last_date 為版本 2）
+from modules.migrations import migrate
 
-conn = sqlite3.connect("billing.db")
-c = conn.cursor()
-
-# 如果欄位不存在，才新增
-try:
-    c.execute("ALTER TABLE billing_summary ADD COLUMN last_date TEXT")
-    print("已新增欄位 last_date")
-except sqlite3.OperationalError as e:
-    if "duplicate column name" in str(e):
-        print("欄位 last_date 已存在")
-    else:
-        raise
-
-conn.commit()
-conn.close()
+migrate()
@@ -0,0 +1,81 @@
+"""
+Worker 啟動時間量測：以 python -X importtime 匯入 app，列出各模組匯入成本，
+總時間超過預算時以非 0 結束碼離開（可放在部署前檢查）。
+
+用法：
+    python import_profile.py                 # 預設預算 IMPORT_BUDGET_MS 或 600 ms
+    python import_profile.py --budget-ms 400 --top 30
+    python import_profile.py --module modules.billing
+"""
+import argparse
+from collections import defaultdict
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUDGET_MS = int(os.environ.get('IMPORT_BUDGET_MS', 600))
+
+
+def run_importtime(module):
+    env = dict(os.environ)
+    env.setdefault('WORKBOOK_REFRESH_SECONDS', '0')   # 不啟動背景下載，只量匯入本身
+    env.setdefault('SHEET_SYNC_SECONDS', '0')         # 不啟動 Google Sheet 同步
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f'❌ 匯入 {module} 失敗')
+    return proc.stderr
+
+
+def parse_importtime(output):
+    """ 回傳 [(模組名稱, 自身 µs, 累計 µs, 深度)] """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='量測匯入 app 的模組成本')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget-ms', type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = parse_importtime(run_importtime(args.module))
+    total_ms = next((cum for name, _, cum, _ in reversed(rows) if name == args.module), 0) / 1000
+
+    # 依頂層套件彙總自身時間（pandas.* 全部算在 pandas）
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split('.')[0]] += self_us
+
+    print(f'📦 依套件彙總（前 {args.top} 名）')
+    for package, us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f'  {us / 1000:8.1f} ms  {package}')
+
+    # args.module 直接匯入的模組與其累計時間
+    direct = [r for r in rows if r[3] == 1]
+    print(f'\n📥 {args.module} 直接匯入的模組（累計）')
+    for name, _, cum, _ in sorted(direct, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f'  {cum / 1000:8.1f} ms  {name}')
+
+    print(f'\n⏱️ 匯入 {args.module} 共 {total_ms:.1f} ms（預算 {args.budget_ms} ms）')
+    if total_ms > args.budget_ms:
+        print('❌ 超出預算')
+        return 1
+    print('✅ 在預算內')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
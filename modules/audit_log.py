@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+from modules.db import connect
+from modules.gsheet import get_worksheet
+from modules.sheet_sync import LEASE_SCHEMA, acquire_lease, lease_owner, release_lease
+
+DB_FILE = "billing.db"
+LOG_TAB = "log"
+AUDIT_FLUSH_SECONDS = int(os.environ.get('AUDIT_FLUSH_SECONDS', 10))
+AUDIT_BATCH_SIZE = 200
+FLUSH_LEASE_SECONDS = 60
+CLAIM_SECONDS = 300   # 批次送出期間的認領時間（需長於 sheets_scheduler 排隊 + 重試的最長時間）
+
+
+# ====== 登入紀錄 outbox（寫入 Google Sheet「log」分頁） ======
+class LoginAuditQueue:
+    """
+    登入時只把紀錄寫進 billing.db 的 login_audit_outbox（本地交易，不經網路），
+    由背景執行緒批次以 append_rows 送到 Google Sheet。
+    id 沿用原本「資料列數 + 1」的編號方式，由 outbox 的 seq 決定：id = seq + offset，
+    offset 只在第一次送出時讀一次 A 欄的列數算出，之後存在 sheet_sync_state，不再讀 Sheet。
+    每批先以短交易續約並認領（claimed_by），不開交易呼叫 Google Sheets，成功後再以短交易刪除，
+    送出期間 record() 不會被寫入鎖擋住；程式中途結束時未送出的紀錄保留到下次啟動。
+    """
+
+    def __init__(self, db_file=DB_FILE, tab=LOG_TAB, interval=AUDIT_FLUSH_SECONDS):
+        self.db_file = db_file
+        self.tab = tab
+        self.interval = interval
+        self._schema_ready = False
+        self._wake = threading.Event()
+        self._thread_pid = None
+        self._thread_lock = threading.Lock()
+
+    def _connect(self):
+        conn = connect(self.db_file)
+        if not self._schema_ready:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS login_audit_outbox (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT,
+                    ip_address TEXT,
+                    login_date TEXT,
+                    login_time TEXT,
+                    created_at TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                );
+            """ + LEASE_SCHEMA)
+            outbox_cols = {r[1] for r in conn.execute("PRAGMA table_info(login_audit_outbox)")}
+            for col, decl in (("claimed_by", "TEXT"), ("claimed_until", "REAL NOT NULL DEFAULT 0")):
+                if col not in outbox_cols:
+                    conn.execute(f"ALTER TABLE login_audit_outbox ADD COLUMN {col} {decl}")
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def record(self, username, ip_address, login_date, login_time, created_at):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO login_audit_outbox (username, ip_address, login_date, login_time, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (username, ip_address, login_date, login_time, created_at)
+                )
+        finally:
+            conn.close()
+        self.start()
+        self._wake.set()
+
+    def pending(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM login_audit_outbox").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _id_offset(self, conn, first_seq):
+        """ log id 與 outbox seq 的差（sheet_sync_state 的 until 欄）；第一次送出時依 Sheet 現有列數決定（不開交易讀取） """
+        row = conn.execute("SELECT until FROM sheet_sync_state WHERE name = 'login_audit_offset'").fetchone()
+        if row:
+            return int(row[0])
+        next_id = len(get_worksheet(self.tab).col_values(1))   # 含標題列的列數 = 下一筆 id
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sheet_sync_state (name, owner, until) VALUES ('login_audit_offset', ?, ?)",
+                (lease_owner(), next_id - first_seq)
+            )
+        return int(conn.execute("SELECT until FROM sheet_sync_state WHERE name = 'login_audit_offset'").fetchone()[0])
+
+    def _claim(self, conn):
+        """ 短交易：續約並認領下一批紀錄；租約在其他 worker 手上時回傳 None """
+        owner = lease_owner()
+        with conn:
+            if not acquire_lease(conn, 'login_audit', FLUSH_LEASE_SECONDS):
+                return None
+            now = time.time()
+            batch = conn.execute(
+                "SELECT seq, username, ip_address, login_date, login_time, created_at FROM login_audit_outbox "
+                "WHERE claimed_by IS NULL OR claimed_by = ? OR claimed_until < ? ORDER BY seq LIMIT ?",
+                (owner, now, AUDIT_BATCH_SIZE)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE login_audit_outbox SET claimed_by = ?, claimed_until = ? WHERE seq = ?",
+                [(owner, now + CLAIM_SECONDS, r[0]) for r in batch]
+            )
+        return batch
+
+    def flush(self):
+        """ 送出目前 outbox 中的紀錄，回傳送出筆數；其他 worker 正在送出時回傳 0 """
+        owner = lease_owner()
+        conn = self._connect()
+        try:
+            sent = 0
+            try:
+                while True:
+                    batch = self._claim(conn)
+                    if not batch:
+                        return sent
+                    seqs = [(owner, r[0]) for r in batch]
+                    try:
+                        offset = self._id_offset(conn, batch[0][0])
+                        get_worksheet(self.tab).append_rows([[r[0] + offset] + list(r[1:]) for r in batch])
+                    except Exception as e:
+                        with conn:
+                            conn.executemany(
+                                "UPDATE login_audit_outbox SET claimed_by = NULL, claimed_until = 0, "
+                                "attempts = attempts + 1, last_error = ? WHERE claimed_by = ? AND seq = ?",
+                                [(str(e)[:500], *k) for k in seqs]
+                            )
+                        raise
+                    with conn:
+                        conn.executemany("DELETE FROM login_audit_outbox WHERE claimed_by = ? AND seq = ?", seqs)
+                    sent += len(batch)
+            finally:
+                with conn:
+                    release_lease(conn, 'login_audit')
+        finally:
+            conn.close()
+
+    def start(self):
+        """ 每個 worker 行程一條背景執行緒；啟動時順便送出上次未送完的紀錄 """
+        if self._thread_pid == os.getpid():   # 已啟動時不必取鎖（每個請求都會呼叫）
+            return
+        with self._thread_lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            try:
+                if self.pending():
+                    self.flush()
+            except Exception as e:
+                print(f"⚠️ 寫入登入日誌至 Google Sheet 失敗，稍後重試: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+login_audit = LoginAuditQueue()
@@ -0,0 +1,260 @@
+"""
+月底批次計費：一次計算 contracts 內所有設備（合開群組以主機計費）的當月帳單並寫入 billing_summary。
+
+計算規則與 billing.calculate 相同（贈送張數、誤差率、基本張數、含稅 / 未稅），
+只是改以 NumPy 陣列逐欄計算；金額最後仍以 Python round(x, 2) 取到小數兩位，
+結果與逐台呼叫 calculate 完全一致（--verify 會逐台比對）。
+
+    python -m modules.batch_billing --year 2026 --month 6            # 計算並寫入
+    python -m modules.batch_billing --year 2026 --month 6 --dry-run  # 只計算
+    python -m modules.batch_billing --year 2026 --month 6 --verify   # 與 calculate 逐台比對
+
+當月抄表數取自 usage（每台設備 month = 抄表月份的最新一筆），
+上月累計取自計費月份前一個月的 billing_summary（billing.load_last_totals）。
+"""
+import argparse
+from datetime import datetime
+
+from modules.billing import DB_FILE, calculate, load_last_totals
+from modules.db import connect
+from modules.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+# 與 calculate 相同，契約數值欄位（含贈送張數、基本張數）一律以 float 計算
+FLOAT_FIELDS = [
+    "monthly_rent", "color_unit_price", "bw_unit_price", "color_a3_unit_price",
+    "color_giveaway", "bw_giveaway", "color_a3_giveaway",
+    "color_error_rate", "bw_error_rate", "color_a3_error_rate",
+    "color_basic", "bw_basic", "color_a3_basic",
+]
+# (calculate 結果欄位前綴, 契約欄位前綴)
+COLORS = [("彩色A3", "color_a3"), ("彩色", "color"), ("黑白", "bw")]
+TAX_RATE = 0.05
+
+
+def _to_float(val):
+    try:
+        return float(val or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_int(val):
+    try:
+        return int(float(val or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+# ====== 讀取契約、群組與抄表數 ======
+def load_contract_rows(conn):
+    """ contracts 全表原始資料列：{device_id: dict}（--verify 直接以此呼叫 calculate） """
+    cur = conn.execute("SELECT * FROM contracts")
+    columns = [d[0] for d in cur.description]
+    rows = {}
+    for row in cur.fetchall():
+        contract = dict(zip(columns, row))
+        rows[str(contract["device_id"]).strip()] = contract
+    return rows
+
+
+def to_numeric(rows):
+    """ 數值欄位轉換方式同 calculate：無法轉換時為 0.0 """
+    contracts = {}
+    for device_id, row in rows.items():
+        contract = dict(row)
+        for k in FLOAT_FIELDS:
+            contract[k] = _to_float(contract.get(k))
+        contracts[device_id] = contract
+    return contracts
+
+
+def load_contracts(conn):
+    return to_numeric(load_contract_rows(conn))
+
+
+def build_groups(contracts):
+    """
+    依 master_device_id 分組，回傳 [(計費設備, 成員清單)]；成員順序同 get_related_devices（主機在前）。
+    主機沒有契約時（子機指向不存在的主機），改由第一台子機計費。
+    """
+    subs = {}
+    for device_id, contract in contracts.items():
+        master = str(contract.get("master_device_id") or "").strip()
+        if master:
+            subs.setdefault(master, []).append(device_id)
+
+    groups = []
+    for device_id, contract in contracts.items():
+        if not str(contract.get("master_device_id") or "").strip():
+            groups.append((device_id, [device_id] + subs.get(device_id, [])))
+    for master, members in subs.items():
+        if master not in contracts:
+            groups.append((members[0], [master] + members))
+    return groups
+
+
+def load_current_counts(conn, usage_month):
+    """ 當月抄表數：每台設備 usage 中 month = usage_month 的最新一筆 """
+    rows = conn.execute("""
+        SELECT u.device_id, u.color_a3_count, u.color_count, u.bw_count
+        FROM usage u
+        JOIN (SELECT device_id, MAX(id) AS id FROM usage WHERE month=? GROUP BY device_id) latest
+          ON u.id = latest.id
+    """, (usage_month,)).fetchall()
+    return {r[0]: (_to_int(r[1]), _to_int(r[2]), _to_int(r[3])) for r in rows}
+
+
+# ====== 逐欄計算 ======
+def compute(contracts, curr, last):
+    """
+    contracts：計費設備的契約 list；curr / last：shape (n, 3) 的群組合計（彩色A3、彩色、黑白）。
+    與 calculate 相同的運算順序，回傳各欄陣列（金額尚未四捨五入）。
+    """
+    def column(key):
+        return np.array([c[key] for c in contracts], dtype=np.float64)
+
+    # calculate 以 safe_int 取整抄表數
+    curr = np.trunc(np.asarray(curr, dtype=np.float64)).astype(np.int64)
+    last = np.trunc(np.asarray(last, dtype=np.float64)).astype(np.int64)
+    used = np.maximum(0, curr - last)
+
+    out = {}
+    subtotal = column("monthly_rent")
+    for i, (label, prefix) in enumerate(COLORS):
+        bill = np.maximum(0, used[:, i] - column(f"{prefix}_giveaway"))
+        bill = np.rint(bill * (1 - column(f"{prefix}_error_rate"))).astype(np.int64)
+        basic = column(f"{prefix}_basic")
+        bill = np.where(basic > 0, np.maximum(basic.astype(np.int64), bill), bill)
+        amount = bill * column(f"{prefix}_unit_price")
+        subtotal = subtotal + amount
+        out[f"{label}使用張數"] = used[:, i]
+        out[f"{label}計費張數"] = bill
+        out[f"{label}金額"] = amount
+
+    untaxed_type = np.array([c.get("tax_type") == "未稅" for c in contracts], dtype=bool)
+    tax_excl = subtotal * TAX_RATE
+    untaxed_incl = subtotal / (1 + TAX_RATE)
+    out["月租金"] = column("monthly_rent")
+    out["未稅小計"] = np.where(untaxed_type, subtotal, untaxed_incl)
+    out["稅額"] = np.where(untaxed_type, tax_excl, subtotal - untaxed_incl)
+    out["含稅總額"] = np.where(untaxed_type, subtotal + tax_excl, subtotal)
+    return out
+
+
+def to_results(columns, n):
+    """ 陣列轉回 calculate 格式的 dict list；金額用 Python round 與 calculate 一致 """
+    lists = {k: v.tolist() for k, v in columns.items()}
+    results = []
+    for i in range(n):
+        row = {}
+        for k, values in lists.items():
+            row[k] = values[i] if k.endswith("張數") else round(values[i], 2)
+        results.append(row)
+    return results
+
+
+# ====== 批次執行 ======
+def bill_groups(contracts, groups, current, last_totals):
+    """
+    以當月抄表數 current 與上月累計 last_totals 計算各群組，
+    回傳 (billed, missing)：billed 為 [(device_id, 當月合計, 上月合計, 結果)]，
+    群組中任一台沒有當月抄表時整組略過，列入 missing [(device_id, 缺少的設備)]。
+    """
+    billed, missing, curr_rows, last_rows = [], [], [], []
+    for device_id, members in groups:
+        absent = [d for d in members if d not in current]
+        if absent:
+            missing.append((device_id, absent))
+            continue
+        billed.append(device_id)
+        curr_rows.append([sum(current[d][i] for d in members) for i in range(3)])
+        last_rows.append([sum(last_totals.get(d, (0, 0, 0))[i] for d in members) for i in range(3)])
+
+    if not billed:
+        return [], missing
+    results = to_results(compute([contracts[d] for d in billed], curr_rows, last_rows), len(billed))
+    return list(zip(billed, curr_rows, last_rows, results)), missing
+
+
+def verify_groups(rows, billed):
+    """ 以 contracts 原始資料列逐台呼叫 calculate 重算，回傳不一致的 [(device_id, calculate 結果, 批次結果)] """
+    mismatch = []
+    for device_id, curr, last, result in billed:
+        expected = calculate(dict(rows[device_id]), *curr, *last)
+        if expected != result:
+            mismatch.append((device_id, expected, result))
+    return mismatch
+
+
+def save_summaries(conn, year, month, billed):
+    """ billing_summary 一次 executemany 寫入（交易由呼叫端控制） """
+    conn.executemany("""
+        INSERT OR REPLACE INTO billing_summary (
+            device_id, month, year,
+            color_a3_total, color_total, bw_total,
+            color_a3_usage, color_usage, bw_usage,
+            color_a3_bill_usage, color_bill_usage, bw_bill_usage,
+            color_a3_amount, color_amount, bw_amount,
+            monthly_rent, untaxed_subtotal, tax_amount, total_with_tax
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (device_id, month, year, *curr,
+         *(max(0, c - l) for c, l in zip(curr, last)),
+         r["彩色A3計費張數"], r["彩色計費張數"], r["黑白計費張數"],
+         r["彩色A3金額"], r["彩色金額"], r["黑白金額"],
+         r["月租金"], r["未稅小計"], r["稅額"], r["含稅總額"])
+        for device_id, curr, last, r in billed
+    ])
+
+
+def run_batch(year, month, usage_month=None, dry_run=False, verify=False, db_file=DB_FILE):
+    """ 回傳 {"billed": [(device_id, 當月合計, 上月合計, 結果)], "missing": [...], "mismatch": [...]} """
+    usage_month = usage_month or f"{year}{month:02d}"
+    conn = connect(db_file)
+    try:
+        rows = load_contract_rows(conn)
+        contracts = to_numeric(rows)
+        billed, missing = bill_groups(
+            contracts, build_groups(contracts), load_current_counts(conn, usage_month), load_last_totals(conn, year, month)
+        )
+        report = {"billed": billed, "missing": missing, "mismatch": []}
+        if verify:
+            report["mismatch"] = verify_groups(rows, billed)
+        if billed and not dry_run:
+            with conn:
+                save_summaries(conn, year, month, billed)
+        return report
+    finally:
+        conn.close()
+
+
+def main():
+    now = datetime.now()
+    parser = argparse.ArgumentParser(description="月底批次計費")
+    parser.add_argument("--year", type=int, default=now.year)
+    parser.add_argument("--month", type=int, default=now.month)
+    parser.add_argument("--usage-month", help="usage.month 抄表月份（YYYYMM），預設同計費月份")
+    parser.add_argument("--dry-run", action="store_true", help="只計算，不寫入 billing_summary")
+    parser.add_argument("--verify", action="store_true", help="逐台與 billing.calculate 比對")
+    args = parser.parse_args()
+
+    report = run_batch(args.year, args.month, args.usage_month, args.dry_run, args.verify)
+    total = sum(r["含稅總額"] for _, _, _, r in report["billed"])
+    action = "試算" if args.dry_run else "寫入"
+    print(f"✅ {args.year}/{args.month:02d} 已{action} {len(report['billed'])} 筆，含稅總額合計 {round(total, 2)}")
+    if report["missing"]:
+        shown = ', '.join(d for d, _ in report['missing'][:10])
+        more = '…' if len(report['missing']) > 10 else ''
+        print(f"⚠️ {len(report['missing'])} 組缺少當月抄表：{shown}{more}")
+    if args.verify:
+        if report["mismatch"]:
+            for device_id, expected, actual in report["mismatch"]:
+                print(f"❌ {device_id} 與 calculate 不一致：{expected} != {actual}")
+        else:
+            print("✅ 與 calculate 逐台比對一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,18 @@
 from flask import Blueprint, render_template, request, redirect, url_for, abort, jsonify, current_app, flash
 from flask_login import login_user, logout_user, login_required, UserMixin
 from werkzeug.security import check_password_hash
-import sqlite3
+import os
 from datetime import datetime
-import requests
-from io import BytesIO
-import pandas as pd
 from zoneinfo import ZoneInfo
-from modules.gsheet import (
-    client, 
-    SHEET_ID, 
-    get_person_worksheet, 
-    get_customer_worksheet, 
-    get_contract_worksheet
-)
+from modules.workbook import WorkbookSource, WorkbookSnapshot
+from modules.lazy import lazy_import
+from modules.sheet_table import SheetTable
+from modules.audit_log import login_audit
+from modules.db import get_db
+from modules.device_groups import device_groups
+from modules.migrations import migrate
+
+pd = lazy_import('pandas')
 
 
 # 統一宣告藍圖為 billing_bp，供 app.py 註冊與 url_for("billing.xxx") 調用
@@ -22,7 +21,14 @@ bp = billing_bp  # 相容性別名
 
 GITHUB_XLSX_URL = 'https://raw.githubusercontent.com/Yang-0419-di/FW_2/master/MFP/MFP.xlsx'
 DB_FILE = "billing.db"
-_cached_xls = None   # 快取避免多次下載
+_cached_xls = None   # 本地 fallback 快取
+
+# MFP.xlsx 與 data.xlsx 共用同一套快照/本地快取機制
+mfp_source = WorkbookSource(
+    GITHUB_XLSX_URL,
+    timeout=10,
+    interval=int(os.environ.get('WORKBOOK_REFRESH_SECONDS', 60))
+)
 
 def to_int(val):
     try:
@@ -51,11 +57,10 @@ def login():
         password = request.form.get('password')
         
         if username and password:
-            conn = sqlite3.connect(DB_FILE)
+            conn = get_db()
             c = conn.cursor()
             c.execute('SELECT id, username, password_hash FROM users WHERE username = ?', (username,))
             user_row = c.fetchone()
-            conn.close()
             
             if user_row:
                 user_id, db_username, db_password_hash = user_row
@@ -83,24 +88,11 @@ def login():
                     login_time = now.strftime('%H:%M:%S')
                     created_at = now.strftime('%Y-%m-%d %H:%M:%S')
 
-                    # 📝 寫入登入日誌至 Google Sheet 的 log 分頁
+                    # 📝 登入日誌先寫入本地 outbox，由背景批次送到 Google Sheet 的 log 分頁
                     try:
-                        sh = client.open_by_key(SHEET_ID)
-                        ws = sh.worksheet("log")
-                        
-                        # 自動計算遞增 ID (總筆數扣除標題列 + 1)
-                        new_id = len(ws.get_all_values())
-                        
-                        ws.append_row([
-                            new_id,          # id
-                            db_username,     # username
-                            ip_address,      # ip_address
-                            login_date,      # login_date
-                            login_time,      # login_time
-                            created_at       # created_at
-                        ])
+                        login_audit.record(db_username, ip_address, login_date, login_time, created_at)
                     except Exception as e:
-                        print(f"⚠️ 寫入登入日誌至 Google Sheet 失敗: {e}")
+                        print(f"⚠️ 寫入登入日誌失敗: {e}")
 
                     # 嚴格檢查 next_page 是否為無效的空值/空字串
                     next_page = request.args.get('next')
@@ -153,157 +145,40 @@ def color_overdue(val, last_pm, cycle):
 # ================================================================
 def load_github_excel(filename="MFP.xlsx"):
     """
-    安全下載 GitHub RAW EXCEL（含快取與 fallback）
+    安全下載 GitHub RAW EXCEL（含本地磁碟快取、背景更新與 fallback）
     filename: 可選，本地 fallback 使用的 Excel 檔名
+    回傳 WorkbookSnapshot（以 xls.read_excel(...) 讀取）
     """
     global _cached_xls
 
-    if _cached_xls and _cached_xls.get('filename') == filename:
+    if mfp_source.snapshot is None and _cached_xls and _cached_xls.get('filename') == filename:
+        # 已改用本地檔；背景執行緒持續嘗試 GitHub，成功後自動切回
+        mfp_source.start_refresher()
         return _cached_xls['xls']
 
     try:
-        resp = requests.get(GITHUB_XLSX_URL, timeout=10)
-        if resp.status_code != 200:
-            raise Exception(f"HTTP {resp.status_code}")
-
-        excel_bytes = BytesIO(resp.content)
-
-        import zipfile
-        if not zipfile.is_zipfile(excel_bytes):
-            raise Exception("下載內容不是 Excel（不是 zip 格式）")
-
-        xls = pd.ExcelFile(excel_bytes, engine="openpyxl")
-        _cached_xls = {'filename': filename, 'xls': xls}
-        return xls
-
+        return mfp_source.get()
     except Exception as e:
         print(f"⚠ GitHub Excel 載入失敗，改用本地 {filename}，原因：{e}")
         local_path = f"MFP/{filename}"
-        xls = pd.ExcelFile(local_path, engine="openpyxl")
+        xls = WorkbookSnapshot.from_path(local_path)
         _cached_xls = {'filename': filename, 'xls': xls}
         return xls
 
 # --- 初始化資料庫 ---
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS contracts (
-            device_id TEXT PRIMARY KEY,
-            monthly_rent REAL,
-            color_unit_price REAL,
-            bw_unit_price REAL,
-            color_a3_unit_price REAL DEFAULT 0,
-            color_giveaway INTEGER,
-            bw_giveaway INTEGER,
-            color_a3_giveaway INTEGER DEFAULT 0,
-            color_error_rate REAL,
-            bw_error_rate REAL,
-            color_a3_error_rate REAL DEFAULT 0,
-            color_basic INTEGER,
-            bw_basic INTEGER,
-            color_a3_basic INTEGER DEFAULT 0,
-            tax_type TEXT DEFAULT '含稅',
-            contra TEXT DEFAULT '',
-            master_device_id TEXT DEFAULT ''
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS usage (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            device_id TEXT,
-            month TEXT,
-            color_a3_count INTEGER DEFAULT 0,
-            color_count INTEGER,
-            bw_count INTEGER,
-            timestamp TEXT,
-            last_date TEXT DEFAULT '' 
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS customers (
-            device_id TEXT PRIMARY KEY,
-            customer_name TEXT,
-            device_number TEXT,
-            machine_model TEXT,
-            tax_id TEXT,
-            install_address TEXT,
-            service_person TEXT,
-            contract_number TEXT,
-            contract_start TEXT,
-            contract_end TEXT
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS billing_summary (
-            device_id TEXT,
-            month INTEGER,
-            year INTEGER,
-
-            color_a3_total INTEGER,
-            color_total INTEGER,
-            bw_total INTEGER,
-
-            color_a3_usage INTEGER,
-            color_usage INTEGER,
-            bw_usage INTEGER,
-
-            color_a3_bill_usage INTEGER,
-            color_bill_usage INTEGER,
-            bw_bill_usage INTEGER,
-
-            color_a3_amount REAL,
-            color_amount REAL,
-            bw_amount REAL,
-
-            monthly_rent REAL,
-            untaxed_subtotal REAL,
-            tax_amount REAL,
-            total_with_tax REAL,
-
-            PRIMARY KEY (device_id, month, year)
-        )
-    """)
-
-    # 📜 自動建立登入日誌資料表 (log)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            ip_address TEXT NOT NULL,
-            login_date TEXT NOT NULL,
-            login_time TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    """ 資料表與索引由 modules.migrations 依版本建立 """
+    migrate(DB_FILE)
 
 init_db()
 
+# ====== contracts / customers 分頁快取 ======
+contracts_table = SheetTable("contracts")
+customers_table = SheetTable("customers", index_fields=("service_person",))
+
 # --- 查詢契約 ---
 def get_contract(device_id):
-    ws = get_person_worksheet("contracts")
-    rows = ws.get_all_records()
-
-    contract_row = next(
-        (row for row in rows
-         if str(row.get("device_id", "")).strip() == str(device_id).strip()),
-        None
-    )
+    contract_row = contracts_table.get(device_id)
 
     if not contract_row:
         return None, ""
@@ -336,14 +211,7 @@ def get_contract(device_id):
 
 # --- 查詢客戶資料 ---
 def get_customer(device_id):
-    ws = get_person_worksheet("customers")
-    rows = ws.get_all_records()
-
-    row = next(
-        (r for r in rows
-         if str(r.get("device_id", "")).strip() == str(device_id).strip()),
-        None
-    )
+    row = customers_table.get(device_id)
 
     if not row:
         return None
@@ -375,8 +243,7 @@ def get_customer(device_id):
 
 # --- 模糊搜尋客戶名稱 ---
 def search_customers_by_name(keyword):
-    ws = get_person_worksheet("customers")
-    rows = ws.get_all_records()
+    rows = customers_table.records()
 
     result = []
     keyword_lower = keyword.lower().strip()
@@ -391,60 +258,20 @@ def search_customers_by_name(keyword):
     return result
 
 def update_contract(device_id, contract_data):
-    ws = get_person_worksheet("contracts")
-    rows = ws.get_all_records()
-
-    for idx, row in enumerate(rows, start=2):
-        if str(row.get("device_id", "")).strip() == str(device_id).strip():
-            for key, value in contract_data.items():
-                try:
-                    col = list(row.keys()).index(key) + 1
-                    ws.update_cell(idx, col, value)
-                except Exception:
-                    pass
-            return True
-    return False
+    result = contracts_table.update(device_id, contract_data)
+    device_groups.invalidate()
+    return result
 
 def update_customer(device_id, customer_data):
-    ws = get_person_worksheet("customers")
-    rows = ws.get_all_records()
-
-    for idx, row in enumerate(rows, start=2):
-        if str(row.get("device_id", "")).strip() == str(device_id).strip():
-            for key, value in customer_data.items():
-                try:
-                    col = list(row.keys()).index(key) + 1
-                    ws.update_cell(idx, col, value)
-                except Exception:
-                    pass
-            return True
-    return False
+    return customers_table.update(device_id, customer_data)
 
 def delete_customer(device_id):
-    ws = get_person_worksheet("customers")
-    rows = ws.get_all_records()
-    for idx, row in enumerate(rows, start=2):
-        if str(row.get("device_id", "")).strip() == str(device_id).strip():
-            ws.delete_rows(idx)
-            return True
-    return False
+    return customers_table.delete(device_id)
 
 # 新客戶建檔
 def insert_customer(device_id, customer_data):
     try:
-        ws = get_customer_worksheet()
-        headers = ws.row_values(1)
-        new_row = [""] * len(headers)
-
-        for key, value in customer_data.items():
-            if key in headers:
-                col_index = headers.index(key)
-                new_row[col_index] = value
-
-        if "device_id" in headers:
-            new_row[headers.index("device_id")] = device_id
-
-        ws.append_row(new_row)
+        customers_table.append(device_id, customer_data)
         return True
     except Exception as e:
         print("insert_customer error:", e)
@@ -453,19 +280,8 @@ def insert_customer(device_id, customer_data):
 # 新合約建檔
 def insert_contract(device_id, contract_data):
     try:
-        ws = get_contract_worksheet()
-        headers = ws.row_values(1)
-        new_row = [""] * len(headers)
-
-        for key, value in contract_data.items():
-            if key in headers:
-                col_index = headers.index(key)
-                new_row[col_index] = value
-
-        if "device_id" in headers:
-            new_row[headers.index("device_id")] = device_id
-
-        ws.append_row(new_row)
+        contracts_table.append(device_id, contract_data)
+        device_groups.invalidate()
         return True
     except Exception as e:
         print("insert_contract error:", e)
@@ -481,7 +297,7 @@ def get_prev_month_year(selected_year, selected_month):
 def get_last_counts(device_id, selected_year, selected_month):
     prev_year, prev_month = get_prev_month_year(selected_year, selected_month)
 
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_db()
     c = conn.cursor()
     c.execute("""
         SELECT color_a3_total, color_total, bw_total, last_date
@@ -489,7 +305,6 @@ def get_last_counts(device_id, selected_year, selected_month):
         WHERE device_id=? AND year=? AND month=?
     """, (device_id, prev_year, prev_month))
     row = c.fetchone()
-    conn.close()
 
     if row:
         return row[0] or 0, row[1] or 0, row[2] or 0, row[3] or ""
@@ -498,41 +313,48 @@ def get_last_counts(device_id, selected_year, selected_month):
 
 # --- 合開群組查詢 ---
 def get_related_devices(device_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-
-    c.execute("SELECT master_device_id FROM contracts WHERE device_id=?", (device_id,))
-    row = c.fetchone()
-    if not row:
-        conn.close()
-        return []
-
-    master_id = row[0]
+    return device_groups.related(device_id)
 
-    if not master_id or master_id.strip() == "":
-        c.execute("SELECT device_id FROM contracts WHERE master_device_id=?", (device_id,))
-        subs = [r[0] for r in c.fetchall()]
-        group = [device_id] + subs
-    else:
-        c.execute("SELECT device_id FROM contracts WHERE master_device_id=?", (master_id,))
-        subs = [r[0] for r in c.fetchall()]
-        group = [master_id] + subs
-
-    conn.close()
-    return group
+def load_last_totals(conn, selected_year, selected_month, devices=None):
+    """
+    計費月份的上月累計：selected_year/selected_month 前一個月的 billing_summary，
+    回傳 {device_id: (彩色A3, 彩色, 黑白)}；devices 省略時為全部設備（月底批次計費、抄表匯入共用）。
+    """
+    prev_year, prev_month = get_prev_month_year(selected_year, selected_month)
+    sql = "SELECT device_id, color_a3_total, color_total, bw_total FROM billing_summary WHERE year=? AND month=?"
+    params = [prev_year, prev_month]
+    if devices is not None:
+        sql += f" AND device_id IN ({', '.join('?' * len(devices))})"
+        params += list(devices)
+    totals = {}
+    for r in conn.execute(sql, params).fetchall():
+        totals.setdefault(r[0], (r[1] or 0, r[2] or 0, r[3] or 0))
+    return totals
+
+def get_group_last_counts(devices, selected_year, selected_month):
+    """ 群組各設備上月累計的合計（彩色A3, 彩色, 黑白），一次查詢 """
+    if not devices:
+        return 0, 0, 0
+    totals = load_last_totals(get_db(), selected_year, selected_month, devices)
+    rows = [totals.get(dev, (0, 0, 0)) for dev in devices]
+    return tuple(sum(r[i] for r in rows) for i in range(3))
 
 # --- 紀錄使用量 ---
 def insert_usage(device_id, color_a3, color_count, bw_count):
+    insert_usages([(device_id, color_a3, color_count, bw_count)])
+
+def insert_usages(readings):
+    """ readings：[(device_id, color_a3, color_count, bw_count)]，同一個交易寫入 """
     month = datetime.now().strftime("%Y%m")
     timestamp = datetime.now().strftime("%Y/%m/%d-%H:%M")
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_db()
     c = conn.cursor()
-    c.execute(
+    c.executemany(
         "INSERT INTO usage (device_id, month, color_a3_count, color_count, bw_count, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-        (device_id, month, color_a3, color_count, bw_count, timestamp)
+        [(device_id, month, color_a3, color_count, bw_count, timestamp)
+         for device_id, color_a3, color_count, bw_count in readings]
     )
     conn.commit()
-    conn.close()
 
 # --- 計算邏輯 ---
 def calculate(contract, curr_color_a3, curr_color, curr_bw, last_color_a3, last_color, last_bw):
@@ -621,7 +443,7 @@ def save_monthly_summary(
     last_bw,
     calc_result
 ):
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_db()
     c = conn.cursor()
 
     color_a3_usage = max(0, total_curr_color_a3 - last_color_a3)
@@ -682,11 +504,10 @@ def save_monthly_summary(
     ))
 
     conn.commit()
-    conn.close()
 
 # --- 讀取 billing_summary ---
 def load_billing_summary(device_id, year):
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_db()
     c = conn.cursor()
 
     c.execute("""
@@ -702,7 +523,6 @@ def load_billing_summary(device_id, year):
     """, (device_id, year))
 
     rows = c.fetchall()
-    conn.close()
 
     months = {
         m: {
@@ -762,15 +582,12 @@ def index():
             customer = get_customer(device_id)
             if contract:
                 related_devices = get_related_devices(device_id)
-                total_last_color_a3 = total_last_color = total_last_bw = 0
+                total_last_color_a3, total_last_color, total_last_bw = get_group_last_counts(
+                    related_devices, prev_year, prev_month
+                )
                 total_curr_color_a3 = total_curr_color = total_curr_bw = 0
 
                 for dev in related_devices:
-                    last_a3, last_c, last_b, _ = get_last_counts(dev, prev_year, prev_month)
-                    total_last_color_a3 += last_a3
-                    total_last_color += last_c
-                    total_last_bw += last_b
-
                     val_a3 = request.form.get(f"curr_color_a3_{dev}")
                     val_c = request.form.get(f"curr_color_{dev}")
                     val_b = request.form.get(f"curr_bw_{dev}")
@@ -794,13 +611,15 @@ def index():
                     total_last_bw
                 )
 
-                for dev in related_devices:
-                    insert_usage(
+                insert_usages([
+                    (
                         dev,
                         int(request.form.get(f"curr_color_a3_{dev}", 0)),
                         int(request.form.get(f"curr_color_{dev}", 0)),
                         int(request.form.get(f"curr_bw_{dev}", 0))
                     )
+                    for dev in related_devices
+                ])
 
                 save_monthly_summary(
                     device_id,
@@ -971,9 +790,7 @@ def invoice_log(device_id):
 def mfp_summary():
     keyword = request.args.get("keyword", "").strip()
 
-    ws = get_person_worksheet("customers")
-    rows = ws.get_all_records()
-    tables = rows.copy()
+    tables = customers_table.records()
 
     numeric_fields = ['pm', 'device_number', 'tax_id']
     for row in tables:
@@ -1016,8 +833,8 @@ def mfp_summary():
         ]
 
     xls = load_github_excel("MFP.xlsx")
-    df_area = pd.read_excel(xls, sheet_name='概況', header=0, usecols="A:R", nrows=4).infer_objects()
-    df_cycle = pd.read_excel(xls, sheet_name='概況', header=0, usecols="A:R", skiprows=5, nrows=7).infer_objects()
+    df_area = xls.read_excel(sheet_name='概況', header=0, usecols="A:R", nrows=4).infer_objects()
+    df_cycle = xls.read_excel(sheet_name='概況', header=0, usecols="A:R", skiprows=5, nrows=7).infer_objects()
 
     version = current_app.config.get('VERSION_TIME', '')
 
@@ -1031,9 +848,18 @@ def mfp_summary():
         billing_mfp_summary=True
     )
 
+# ====== 個人分頁（備註 / 抄表方式） ======
+PERSON_FIELDS = {"remark": "備註", "method": "抄表方式"}
+_person_tables = {}
+
+def person_table(sheet_name):
+    table = _person_tables.get(sheet_name)
+    if table is None:
+        table = _person_tables.setdefault(sheet_name, SheetTable(sheet_name, key="設備代號"))
+    return table
+
 def load_person_remarks(sheet_name):
-    ws = get_person_worksheet(sheet_name)
-    rows = ws.get_all_records()
+    rows = person_table(sheet_name).records()
     return {
         r["設備代號"]: {
             "remark": str(r.get("備註", "") or ""),
@@ -1042,28 +868,29 @@ def load_person_remarks(sheet_name):
         for r in rows
     }
 
-def upsert_person_field(sheet_name, device_id, field, value):
-    ws = get_person_worksheet(sheet_name)
-    header = ws.row_values(1)
-
-    device_col = header.index("設備代號") + 1
-    target_col = {
-        "remark": header.index("備註") + 1,
-        "method": header.index("抄表方式") + 1
-    }[field]
-
-    records = ws.get_all_records()
-
-    for idx, r in enumerate(records, start=2):
-        if str(r.get("設備代號")).strip() == str(device_id):
-            ws.update_cell(idx, target_col, value)
-            return
-
-    ws.append_row([
-        str(device_id),
-        str(value) if field == "remark" else "",
-        str(value) if field == "method" else ""
+def upsert_person_fields(sheet_name, changes):
+    """
+    changes 為 [(device_id, field, value)]，field 為 remark / method。
+    既有設備以一次 batch_update 更新，不存在的設備以一次 append_rows 新增；回傳處理筆數。
+    """
+    updates = {}
+    for device_id, field, value in changes:
+        updates.setdefault(str(device_id).strip(), {})[PERSON_FIELDS[field]] = value
+
+    table = person_table(sheet_name)
+    missing = table.update_many(updates)
+
+    table.append_many([
+        (device_id, {
+            "備註": str(updates[device_id].get("備註", "")),
+            "抄表方式": str(updates[device_id].get("抄表方式", ""))
+        })
+        for device_id in missing
     ])
+    return len(changes)
+
+def upsert_person_field(sheet_name, device_id, field, value):
+    upsert_person_fields(sheet_name, [(device_id, field, value)])
 
 @billing_bp.route("/save_person_field", methods=["POST"])
 def save_person_field():
@@ -1076,21 +903,30 @@ def save_person_field():
     )
     return {"ok": True}
 
+@billing_bp.route("/save_person_fields", methods=["POST"])
+def save_person_fields():
+    """ 個人分頁批次儲存：{"sheet": ..., "changes": [{"device_id", "field", "value"}, ...]} """
+    data = request.json or {}
+    changes = [
+        (c["device_id"], c["field"], c.get("value", ""))
+        for c in data.get("changes", [])
+        if c.get("field") in PERSON_FIELDS and c.get("device_id") is not None
+    ]
+    if not data.get("sheet"):
+        return {"ok": False, "message": "缺少分頁名稱"}, 400
+    saved = upsert_person_fields(data["sheet"], changes) if changes else 0
+    return {"ok": True, "saved": saved}
+
 @billing_bp.route("/person/<sheet>")
 def person_page(sheet):
     keyword = request.args.get("keyword", "").strip()
 
     mfp_xls = load_github_excel("MFP.xlsx")
-    df1 = pd.read_excel(mfp_xls, sheet_name=sheet, header=0, usecols="A:R", nrows=4)
-    df2 = pd.read_excel(mfp_xls, sheet_name=sheet, header=0, usecols="A:R", skiprows=5, nrows=4)
+    df1 = mfp_xls.read_excel(sheet_name=sheet, header=0, usecols="A:R", nrows=4)
+    df2 = mfp_xls.read_excel(sheet_name=sheet, header=0, usecols="A:R", skiprows=5, nrows=4)
 
-    ws = get_person_worksheet("customers")
-    rows = ws.get_all_records()
-    all_customers = pd.DataFrame(rows)
-
-    df3 = all_customers[
-        all_customers["service_person"].astype(str).str.strip() == sheet
-    ][["customer_name", "pm", "device_id"]].copy()
+    rows = customers_table.find("service_person", sheet)
+    df3 = pd.DataFrame(rows, columns=customers_table.headers())[["customer_name", "pm", "device_id"]].copy()
 
     df_pm = pd.read_excel("MFP/output.xlsx", sheet_name="customers", usecols="A:L", engine="openpyxl")
     df_pm["device_id"] = df_pm["device_id"].astype(str).str.strip()
@@ -1151,7 +987,7 @@ def route_get_last_counts():
     
     prev_year, prev_month = get_prev_month_year(selected_year, selected_month)
     
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_db()
     c = conn.cursor()
     c.execute("""
         SELECT color_a3_total, color_total, bw_total 
@@ -1159,7 +995,6 @@ def route_get_last_counts():
         WHERE device_id=? AND year=? AND month=?
     """, (device_id, prev_year, prev_month))
     row = c.fetchone()
-    conn.close()
     
     if row:
         return jsonify({
@@ -1178,6 +1013,69 @@ def route_get_last_counts():
             "prev_month": prev_month
         })
 
+@billing_bp.route('/batch_run', methods=['POST'])
+@login_required
+def batch_run():
+    """ 月底批次計費：{"year", "month", "usage_month"?, "dry_run"?} """
+    from modules.batch_billing import run_batch
+
+    data = request.get_json(silent=True) or request.form
+    now = datetime.now()
+    year = int(data.get("year") or now.year)
+    month = int(data.get("month") or now.month)
+    dry_run = str(data.get("dry_run", "")).lower() in ("1", "true", "on")
+
+    report = run_batch(year, month, data.get("usage_month") or None, dry_run=dry_run)
+    return jsonify({
+        "ok": True,
+        "year": year,
+        "month": month,
+        "dry_run": dry_run,
+        "billed": [
+            {"device_id": device_id, **result}
+            for device_id, _, _, result in report["billed"]
+        ],
+        "missing": [
+            {"device_id": device_id, "devices": devices}
+            for device_id, devices in report["missing"]
+        ]
+    })
+
+@billing_bp.route('/import_readings', methods=['POST'])
+@login_required
+def import_readings_route():
+    """ 抄表檔批次匯入：multipart 欄位 file（CSV / XLSX）、year、month、dry_run """
+    from modules.meter_import import import_readings, read_readings
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify({"ok": False, "errors": ["請選擇抄表檔"]}), 400
+
+    now = datetime.now()
+    year = int(request.form.get("year") or now.year)
+    month = int(request.form.get("month") or now.month)
+    dry_run = str(request.form.get("dry_run", "")).lower() in ("1", "true", "on")
+
+    try:
+        rows = read_readings(upload.stream, upload.filename)
+    except Exception as e:
+        return jsonify({"ok": False, "errors": [f"無法讀取抄表檔：{e}"]}), 400
+
+    report = import_readings(rows, year, month, dry_run=dry_run)
+    if report["errors"]:
+        return jsonify({"ok": False, "errors": report["errors"]}), 400
+    return jsonify({
+        "ok": True,
+        "year": year,
+        "month": month,
+        "dry_run": dry_run,
+        "devices": report["devices"],
+        "billed": [
+            {"device_id": device_id, **result}
+            for device_id, _, _, result in report["billed"]
+        ]
+    })
+
 @billing_bp.route('/logout')
 @login_required
 def logout():
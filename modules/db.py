@@ -0,0 +1,142 @@
+"""
+billing.db 連線管理：
+
+- connect()：建立新連線並套用 PRAGMA（WAL、synchronous=NORMAL、mmap、busy_timeout），
+  給背景執行緒、CLI 等自行管理生命週期的程式使用；
+- get_db()：請求期間共用同一條連線（存於 flask.g），請求結束時歸還到執行緒的連線池，
+  同一個 worker 執行緒的下一個請求直接沿用，sqlite3 的 prepared statement 快取也因此持續有效。
+
+    python -m modules.db bench --threads 8 --ops 300   # 比較每次 connect 與連線重用的並行寫入效能
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+DB_FILE = "billing.db"
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024))
+SQLITE_CACHED_STATEMENTS = int(os.environ.get('SQLITE_CACHED_STATEMENTS', 256))
+
+_local = threading.local()
+
+
+def connect(db_file=DB_FILE):
+    """ 新連線：WAL 讓讀取不被寫入阻擋，多個 gunicorn worker 寫入時以 busy_timeout 等待而不是立即失敗 """
+    conn = sqlite3.connect(
+        db_file,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    return conn
+
+
+# ====== 每個執行緒的連線池 ======
+def _pooled(db_file):
+    """ 取得本執行緒對 db_file 的連線；fork 後（pid 不同）不沿用父行程的連線 """
+    pool = getattr(_local, 'pool', None)
+    if pool is None or getattr(_local, 'pid', None) != os.getpid():
+        pool = _local.pool = {}
+        _local.pid = os.getpid()
+    conn = pool.get(db_file)
+    if conn is None:
+        conn = pool[db_file] = connect(db_file)
+    return conn
+
+
+def get_db(db_file=DB_FILE):
+    """
+    請求中：同一請求共用 flask.g 上的連線；請求外（背景執行緒、CLI）：沿用本執行緒的連線。
+    呼叫端不需 close()，寫入後自行 commit()。
+    """
+    from flask import g, has_app_context
+
+    if not has_app_context():
+        return _pooled(db_file)
+    conns = g.setdefault('_db_conns', {})
+    conn = conns.get(db_file)
+    if conn is None:
+        conn = conns[db_file] = _pooled(db_file)
+    return conn
+
+
+def release_db(exc=None):
+    """ teardown：未提交的交易一律回滾，避免下一個請求接手半途的交易或持有寫入鎖 """
+    from flask import g
+
+    for conn in g.pop('_db_conns', {}).values():
+        if conn.in_transaction:
+            conn.rollback()
+
+
+def init_app(app):
+    app.teardown_appcontext(release_db)
+
+
+# ====== 並行寫入效能比較 ======
+def _bench_worker(db_file, ops, pooled, errors):
+    try:
+        for i in range(ops):
+            conn = _pooled(db_file) if pooled else sqlite3.connect(db_file)
+            conn.execute(
+                "INSERT INTO usage (device_id, month, color_a3_count, color_count, bw_count, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (f"T{threading.get_ident() % 100000}", "202601", i, i, i, "")
+            )
+            conn.execute("SELECT color_total FROM billing_summary WHERE device_id=? AND month=?", ("T1", 1)).fetchone()
+            conn.commit()
+            if not pooled:
+                conn.close()
+    except sqlite3.Error as e:
+        errors.append(str(e))
+
+
+def bench(threads=8, ops=300):
+    results = {}
+    for mode, pooled in (("每次 connect（rollback journal）", False), ("連線重用 + WAL", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = os.path.join(tmp, "bench.db")
+            conn = sqlite3.connect(db_file)
+            conn.executescript("""
+                CREATE TABLE usage (id INTEGER PRIMARY KEY AUTOINCREMENT, device_id TEXT, month TEXT,
+                    color_a3_count INTEGER, color_count INTEGER, bw_count INTEGER, timestamp TEXT);
+                CREATE TABLE billing_summary (device_id TEXT, month INTEGER, color_total INTEGER,
+                    PRIMARY KEY (device_id, month));
+            """)
+            conn.close()
+
+            errors = []
+            workers = [
+                threading.Thread(target=_bench_worker, args=(db_file, ops, pooled, errors))
+                for _ in range(threads)
+            ]
+            start = time.perf_counter()
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            elapsed = time.perf_counter() - start
+            _local.pool = {}
+            results[mode] = (elapsed, threads * ops / elapsed, len(errors))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="billing.db 連線管理")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300, help="每個執行緒的寫入交易數")
+    args = parser.parse_args()
+
+    for mode, (elapsed, rate, errors) in bench(args.threads, args.ops).items():
+        print(f"📊 {mode}：{elapsed:.2f} 秒，{rate:.0f} 筆/秒，錯誤 {errors} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+
+from modules.db import DB_FILE, get_db
+from modules.sheet_sync import sheet_mirror
+
+DEVICE_GROUP_TTL = int(os.environ.get('DEVICE_GROUP_TTL_SECONDS', 60))
+
+
+# ====== 合開群組（contracts.master_device_id）記憶體索引 ======
+class DeviceGroupRegistry:
+    """
+    以一次查詢讀出 contracts 的 device_id / master_device_id，在記憶體建立主機 → 子機對照，
+    related() 與原本 get_related_devices 的查詢結果相同，但不再每次查資料庫。
+    contracts 由 sheet_mirror 同步時依鏡像版本判斷是否重建，否則依 TTL；
+    本程式修改契約時呼叫 invalidate()。
+    """
+
+    def __init__(self, db_file=DB_FILE, ttl=DEVICE_GROUP_TTL):
+        self.db_file = db_file
+        self.ttl = ttl
+        self._masters = {}
+        self._subs = {}
+        self._loaded_at = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _stale(self):
+        if self._loaded_at is None:
+            return True
+        version = sheet_mirror.version('contracts')
+        if version is not None:
+            return version != self._version
+        return time.monotonic() - self._loaded_at > self.ttl
+
+    def reload(self):
+        version = sheet_mirror.version('contracts')
+        rows = get_db(self.db_file).execute(
+            "SELECT device_id, master_device_id FROM contracts ORDER BY rowid"
+        ).fetchall()
+        masters, subs = {}, {}
+        for device_id, master_id in rows:
+            masters.setdefault(device_id, master_id)   # 與原本 fetchone() 相同，取第一筆
+            if master_id is not None:
+                subs.setdefault(master_id, []).append(device_id)
+        with self._lock:
+            self._masters, self._subs = masters, subs
+            self._version = version
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def related(self, device_id):
+        """ 設備所屬群組：[主機, 子機...]；設備不在 contracts 時回傳 [] """
+        if self._stale():
+            self.reload()
+        with self._lock:
+            masters, subs = self._masters, self._subs
+        if device_id not in masters:
+            return []
+        master_id = masters[device_id]
+        if not master_id or master_id.strip() == "":
+            return [device_id] + subs.get(device_id, [])
+        return [master_id] + subs.get(master_id, [])
+
+
+device_groups = DeviceGroupRegistry()
@@ -1,61 +1,221 @@
-import gspread
+from datetime import datetime, timezone
 import os
-from google.oauth2.service_account import Credentials
+import threading
+import time
+
+from modules.lazy import LazyObject
+from modules.sheets_scheduler import sheets_scheduler
 
 # ====== Google Sheet 認證 ======
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 DEFAULT_RENDER_SECRET = '/etc/secrets/disk-485810-82346bf9389a.json'
+TOKEN_REFRESH_MARGIN = 300  # access token 到期前幾秒於背景換發
 
 def get_google_client():
+    if os.getenv('SHEETS_BACKEND') == 'emulator':
+        from modules.sheets_emulator import EMULATOR_DB, emulator_client
+        print(f'🧪 使用本機 Google Sheets 模擬器：{EMULATOR_DB}')
+        return emulator_client()
+
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     secret_path = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE', DEFAULT_RENDER_SECRET)
     if not os.path.exists(secret_path):
         raise FileNotFoundError(f'❌ 找不到 Google Service Account JSON：{secret_path}')
     print(f'🔐 使用 Service Account：{secret_path}')
     creds = Credentials.from_service_account_file(secret_path, scopes=SCOPES)
-    return gspread.authorize(creds)
+    gc = gspread.authorize(creds)
+    threading.Thread(target=_token_refresh_loop, args=(creds,), daemon=True).start()
+    return gc
+
+def _token_refresh_loop(creds):
+    """
+    在 token 到期前先行換發，請求執行緒不會遇到過期 token 而同步等待 OAuth。
+    尚未呼叫過 API（還沒有 token）時不預先換發。
+    """
+    from google.auth.transport.requests import Request
 
-client = get_google_client()
+    while True:
+        delay = 60
+        try:
+            if creds.token is not None and creds.expiry is not None:
+                now = datetime.now(timezone.utc).replace(tzinfo=None)  # expiry 為 naive UTC
+                remaining = (creds.expiry - now).total_seconds()
+                if remaining <= TOKEN_REFRESH_MARGIN:
+                    creds.refresh(Request())
+                    remaining = (creds.expiry - now).total_seconds()
+                delay = max(remaining - TOKEN_REFRESH_MARGIN, 30)
+        except Exception as e:
+            print(f"⚠️ Google token 背景更新失敗: {e}")
+        time.sleep(delay)
+
+# 第一次存取 client 屬性時才讀取金鑰並授權，匯入本模組不再觸發認證
+client = LazyObject(get_google_client)
 SHEET_ID = '1cFPw7C97a_xoqodcmvlWKPZJ2aBFvSBPqoE_PGPmxw0'
 
+# ====== 試算表 / 分頁 handle 快取 ======
+WORKSHEET_TTL = int(os.environ.get('WORKSHEET_TTL_SECONDS', 600))
+
+def _is_not_found(e):
+    import gspread
+    if isinstance(e, gspread.exceptions.WorksheetNotFound):
+        return True
+    response = getattr(e, 'response', None)
+    return isinstance(e, gspread.exceptions.APIError) and getattr(response, 'status_code', None) == 404
+
+class WorksheetHandle:
+    """
+    分頁 handle 代理：方法呼叫都經過 sheets_scheduler（配額、退避、合併相同讀取），
+    遇到 404（分頁被刪除後重建）時，重新取得試算表 metadata 並以同名分頁重試一次；
+    非方法的屬性直接轉交 gspread Worksheet。
+    """
+
+    def __init__(self, registry, title):
+        self._registry = registry
+        self._title = title
+
+    def __getattr__(self, name):
+        attr = getattr(self._registry.resolve(self._title), name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            try:
+                return sheets_scheduler.call(self._title, name, attr, args, kwargs)
+            except Exception as e:
+                if not _is_not_found(e):
+                    raise
+                self._registry.invalidate()
+                retry = getattr(self._registry.resolve(self._title), name)
+                return sheets_scheduler.call(self._title, name, retry, args, kwargs)
+        return call
+
+    def __repr__(self):
+        return f'<WorksheetHandle {self._title!r}>'
+
+class WorksheetRegistry:
+    """
+    open_by_key 與 worksheets() 的結果只取一次，之後直接發出分頁 handle，
+    不必每個請求都先打兩次 metadata API；TTL 到期或找不到分頁時重新整理。
+    """
+
+    def __init__(self, spreadsheet_id, ttl=WORKSHEET_TTL):
+        self.spreadsheet_id = spreadsheet_id
+        self.ttl = ttl
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._columns = {}
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _stale(self):
+        return self._spreadsheet is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def refresh(self):
+        requested = time.monotonic()
+        with self._lock:
+            if self._spreadsheet is not None and self._loaded_at >= requested:
+                return   # 等鎖期間已由其他執行緒重新整理
+            sh = sheets_scheduler.execute('read', client.open_by_key, self.spreadsheet_id)
+            self._worksheets = {ws.title: ws for ws in sheets_scheduler.execute('read', sh.worksheets)}
+            self._columns = {}
+            self._spreadsheet = sh
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self._spreadsheet = None
+
+    def spreadsheet(self):
+        if self._stale():
+            self.refresh()
+        return self._spreadsheet
+
+    def batch_get(self, ranges):
+        """ 一次讀取多個範圍（values.batchGet），經過 sheets_scheduler """
+        ranges = list(ranges)
+        return sheets_scheduler.read(
+            ('values_batch_get', tuple(ranges)), lambda: self.spreadsheet().values_batch_get(ranges)
+        )
+
+    def titles(self):
+        if self._stale():
+            self.refresh()
+        return list(self._worksheets)
+
+    def resolve(self, title):
+        """ 回傳 gspread Worksheet；不在快取中時（可能是新分頁）重新整理一次 """
+        if self._stale():
+            self.refresh()
+        ws = self._worksheets.get(title)
+        if ws is None:
+            self.refresh()
+            ws = self._worksheets.get(title)
+            if ws is None:
+                import gspread
+                raise gspread.exceptions.WorksheetNotFound(title)
+        return ws
+
+    def worksheet(self, title):
+        self.resolve(title)
+        return WorksheetHandle(self, title)
+
+    def columns(self, title):
+        """ 第 1 列欄名 → 欄號（1 起算，重複欄名取第一個），與分頁 metadata 一起快取 """
+        if self._stale():
+            self.refresh()
+        columns = self._columns.get(title)
+        if columns is None:
+            columns = header_columns(self.resolve(title).row_values(1))
+            self._columns[title] = columns
+        return columns
+
+worksheets = WorksheetRegistry(SHEET_ID)
+
+def get_worksheet(title):
+    return worksheets.worksheet(title)
+
 def get_person_worksheet(person_name):
-    sh = client.open_by_key(SHEET_ID)
-    return sh.worksheet(person_name)
-
-# ====== contracts 分頁 ======
-def get_contract(device_id):
-    sh = client.open_by_key(SHEET_ID)
-    ws = sh.worksheet("contracts")
-    records = ws.get_all_records()
-    for r in records:
-        if str(r.get("device_id")) == str(device_id):
-            return r
-    return None
-
-# ====== customers 分頁 ======
-def get_customer(device_id):
-    sh = client.open_by_key(SHEET_ID)
-    ws = sh.worksheet("customers")
-    records = ws.get_all_records()
-    for r in records:
-        if str(r.get("device_id")) == str(device_id):
-            return r
-    return None
-
-# ====== 模糊搜尋 customer_name ======
-def search_customers_by_name(keyword):
-    sh = client.open_by_key(SHEET_ID)
-    ws = sh.worksheet("customers")
-    records = ws.get_all_records()
-    keyword_lower = keyword.lower()
-    return [r for r in records if keyword_lower in str(r.get("customer_name", "")).lower()]
+    return get_worksheet(person_name)
+
+def header_columns(headers):
+    columns = {}
+    for idx, h in enumerate(headers, start=1):
+        columns.setdefault(h, idx)
+    return columns
+
+# ====== 單列多欄位更新 ======
+def patch_row(title, row, fields, columns=None, value_input_option='USER_ENTERED'):
+    """
+    以一次 values.batchUpdate 更新同一列的多個欄位（取代逐欄 update_cell）。
+    fields 為 {欄名: 值}；columns 為欄名 → 欄號，省略時使用快取的第 1 列。
+    找不到的欄名略過，回傳實際寫入的欄名。
+    """
+    return patch_rows(title, {row: fields}, columns, value_input_option)[row]
+
+def patch_rows(title, rows, columns=None, value_input_option='USER_ENTERED'):
+    """ 多列版本：rows 為 {列號: {欄名: 值}}，全部合併成一次 batchUpdate；回傳 {列號: 寫入的欄名} """
+    from gspread.utils import rowcol_to_a1
+
+    if columns is None:
+        columns = worksheets.columns(title)
+    data, written = [], {}
+    for row, fields in rows.items():
+        written[row] = []
+        for field, value in fields.items():
+            col = columns.get(field)
+            if col is None:
+                continue
+            data.append({'range': rowcol_to_a1(row, col), 'values': [[value]]})
+            written[row].append(field)
+    if data:
+        get_worksheet(title).batch_update(data, value_input_option=value_input_option)
+    return written
 
 # 回傳 Customers worksheet
 def get_customer_worksheet():
-    sh = client.open_by_key(SHEET_ID)
-    return sh.worksheet("customers")
+    return get_worksheet("customers")
 
 # 回傳 Contracts worksheet
 def get_contract_worksheet():
-    sh = client.open_by_key(SHEET_ID)
-    return sh.worksheet("contracts")
-
+    return get_worksheet("contracts")
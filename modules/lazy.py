@@ -0,0 +1,46 @@
+import importlib
+import threading
+
+
+# ====== 延遲初始化 ======
+class LazyObject:
+    """
+    代理物件：第一次取用屬性時才呼叫 factory() 建立真正的物件，之後的屬性存取都轉交給它。
+    用於載入成本高、但不是每個請求都用得到的模組或連線（pandas、matplotlib、Google Sheets client）。
+    """
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_target', None)
+        object.__setattr__(self, '_lock', threading.RLock())
+
+    def _resolve(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    object.__setattr__(self, '_target', self._factory())
+                target = self._target
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __repr__(self):
+        if self._target is None:
+            return f'<LazyObject {getattr(self._factory, "__name__", self._factory)} (未載入)>'
+        return repr(self._target)
+
+
+def lazy_import(name, on_load=None):
+    """ 回傳模組代理，第一次使用時才 import；on_load(module) 可做載入後的設定 """
+    def load():
+        module = importlib.import_module(name)
+        if on_load is not None:
+            on_load(module)
+        return module
+    load.__name__ = name
+    return LazyObject(load)
@@ -0,0 +1,153 @@
+"""
+抄表數批次匯入：上傳 CSV / XLSX（每列一台設備），依合開群組彙總後
+以同一個交易寫入 usage 與 billing_summary（executemany）。
+
+欄位（大小寫、中英文皆可）：
+    device_id / 設備代號、color_a3 / 彩色A3、color / 彩色、bw / 黑白
+
+    python -m modules.meter_import readings.xlsx --year 2026 --month 6 [--dry-run]
+
+任何一列驗證失敗（未知設備、重複、非數字、群組缺設備、抄表數小於上月累計）整批都不寫入。
+"""
+import argparse
+import os
+from datetime import datetime
+
+from modules.batch_billing import bill_groups, build_groups, load_contracts, save_summaries
+from modules.billing import DB_FILE, load_last_totals
+from modules.db import connect
+from modules.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+COLUMN_ALIASES = {
+    "device_id": ["device_id", "設備代號", "設備編號", "機號"],
+    "color_a3": ["color_a3", "color_a3_count", "彩色a3", "彩色A3"],
+    "color": ["color", "color_count", "彩色"],
+    "bw": ["bw", "bw_count", "黑白"],
+}
+COUNT_FIELDS = ["color_a3", "color", "bw"]
+
+
+# ====== 讀取抄表檔 ======
+def read_readings(source, filename=None):
+    """ source 可為路徑或上傳的檔案物件；回傳 [(列號, device_id, {color_a3, color, bw: 原始值})] """
+    name = (filename or str(source)).lower()
+    if name.endswith((".xlsx", ".xls")):
+        df = pd.read_excel(source, dtype=str)
+    else:
+        df = pd.read_csv(source, dtype=str, encoding="utf-8-sig")
+
+    normalized = {str(c).strip().lower().replace(" ", ""): c for c in df.columns}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias.lower() in normalized:
+                columns[field] = normalized[alias.lower()]
+                break
+    absent = [f for f in ("device_id", "color", "bw") if f not in columns]
+    if absent:
+        raise ValueError(f"抄表檔缺少欄位：{', '.join(absent)}")
+
+    df = df.fillna("")
+    rows = []
+    for i, record in enumerate(df.to_dict(orient="records"), start=2):   # 第 1 列為標題
+        device_id = str(record[columns["device_id"]]).strip()
+        if not device_id:
+            continue
+        rows.append((i, device_id, {f: record[columns[f]] if f in columns else 0 for f in COUNT_FIELDS}))
+    return rows
+
+
+def _count(value):
+    text = str(value).strip().replace(",", "")
+    if text == "":
+        return 0
+    number = float(text)
+    if number < 0 or not number.is_integer():
+        raise ValueError(value)
+    return int(number)
+
+
+# ====== 驗證、計費、寫入 ======
+def import_readings(rows, year, month, dry_run=False, db_file=DB_FILE):
+    """
+    回傳 {"errors": [...], "billed": [(device_id, 當月合計, 上月合計, 結果)], "devices": n}；
+    有錯誤或 dry_run 時不寫入。
+    """
+    conn = connect(db_file)
+    try:
+        contracts = load_contracts(conn)
+        groups = build_groups(contracts)
+        group_of = {d: device_id for device_id, members in groups for d in members}
+
+        errors, current = [], {}
+        for line, device_id, values in rows:
+            if device_id not in group_of:
+                errors.append(f"第 {line} 列：找不到設備 {device_id}")
+                continue
+            if device_id in current:
+                errors.append(f"第 {line} 列：設備 {device_id} 重複")
+                continue
+            try:
+                current[device_id] = tuple(_count(values[f]) for f in COUNT_FIELDS)
+            except ValueError as e:
+                errors.append(f"第 {line} 列：{device_id} 抄表數不是有效的非負整數（{e}）")
+
+        # 只計算檔案中有出現的群組；群組內其他設備也必須一併抄表
+        present = {group_of[d] for d in current}
+        groups = [(device_id, members) for device_id, members in groups if device_id in present]
+        last_totals = load_last_totals(conn, year, month)
+        billed, missing = bill_groups(contracts, groups, current, last_totals)
+        for device_id, absent in missing:
+            errors.append(f"群組 {device_id} 缺少設備抄表：{', '.join(absent)}")
+        for device_id, curr, last, _ in billed:
+            for label, c, l in zip(("彩色A3", "彩色", "黑白"), curr, last):
+                if c < l:
+                    errors.append(f"{device_id} {label}抄表數 {c} 小於上月累計 {l}")
+
+        report = {"errors": errors, "billed": billed, "devices": len(current)}
+        if errors or dry_run:
+            return report
+
+        usage_month = f"{year}{month:02d}"
+        timestamp = datetime.now().strftime("%Y/%m/%d-%H:%M")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO usage (device_id, month, color_a3_count, color_count, bw_count, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(d, usage_month, *counts, timestamp) for d, counts in current.items()]
+            )
+            save_summaries(conn, year, month, billed)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return report
+    finally:
+        conn.close()
+
+
+def main():
+    now = datetime.now()
+    parser = argparse.ArgumentParser(description="抄表數批次匯入")
+    parser.add_argument("file", help="CSV 或 XLSX 抄表檔")
+    parser.add_argument("--year", type=int, default=now.year)
+    parser.add_argument("--month", type=int, default=now.month)
+    parser.add_argument("--dry-run", action="store_true", help="只驗證與試算，不寫入")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        raise SystemExit(f"❌ 找不到檔案：{args.file}")
+    report = import_readings(read_readings(args.file), args.year, args.month, args.dry_run)
+    if report["errors"]:
+        for err in report["errors"]:
+            print(f"❌ {err}")
+        raise SystemExit(f"⚠️ 共 {len(report['errors'])} 個錯誤，未寫入任何資料")
+    action = "驗證" if args.dry_run else "匯入"
+    print(f"✅ 已{action} {report['devices']} 台設備、{len(report['billed'])} 組帳單（{args.year}/{args.month:02d}）")
+
+
+if __name__ == "__main__":
+    main()
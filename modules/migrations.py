@@ -0,0 +1,216 @@
+"""
+billing.db 資料表版本管理：依序執行 MIGRATIONS，已套用的版本記錄在 schema_version。
+
+啟動時 migrate() 只需查一次 schema_version 的最大版本；已是最新版時不做任何事。
+新增欄位 / 索引請在 MIGRATIONS 最後加一筆，不要修改已發佈的版本。
+
+    python -m modules.migrations          # 套用尚未執行的版本
+    python -m modules.migrations status   # 列出已套用的版本
+"""
+import argparse
+import time
+from datetime import datetime
+
+from modules.db import DB_FILE, connect
+
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )
+"""
+
+
+# ====== 各版本 ======
+def _base_tables(conn):
+    """ 原 billing.init_db 建立的資料表（已存在的表不變動，billing_summary 主鍵維持原樣） """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS contracts (
+            device_id TEXT PRIMARY KEY,
+            monthly_rent REAL,
+            color_unit_price REAL,
+            bw_unit_price REAL,
+            color_a3_unit_price REAL DEFAULT 0,
+            color_giveaway INTEGER,
+            bw_giveaway INTEGER,
+            color_a3_giveaway INTEGER DEFAULT 0,
+            color_error_rate REAL,
+            bw_error_rate REAL,
+            color_a3_error_rate REAL DEFAULT 0,
+            color_basic INTEGER,
+            bw_basic INTEGER,
+            color_a3_basic INTEGER DEFAULT 0,
+            tax_type TEXT DEFAULT '含稅',
+            contra TEXT DEFAULT '',
+            master_device_id TEXT DEFAULT ''
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            device_id TEXT,
+            month TEXT,
+            color_a3_count INTEGER DEFAULT 0,
+            color_count INTEGER,
+            bw_count INTEGER,
+            timestamp TEXT,
+            last_date TEXT DEFAULT ''
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS customers (
+            device_id TEXT PRIMARY KEY,
+            customer_name TEXT,
+            device_number TEXT,
+            machine_model TEXT,
+            tax_id TEXT,
+            install_address TEXT,
+            service_person TEXT,
+            contract_number TEXT,
+            contract_start TEXT,
+            contract_end TEXT
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS billing_summary (
+            device_id TEXT,
+            month INTEGER,
+            year INTEGER,
+
+            color_a3_total INTEGER,
+            color_total INTEGER,
+            bw_total INTEGER,
+
+            color_a3_usage INTEGER,
+            color_usage INTEGER,
+            bw_usage INTEGER,
+
+            color_a3_bill_usage INTEGER,
+            color_bill_usage INTEGER,
+            bw_bill_usage INTEGER,
+
+            color_a3_amount REAL,
+            color_amount REAL,
+            bw_amount REAL,
+
+            monthly_rent REAL,
+            untaxed_subtotal REAL,
+            tax_amount REAL,
+            total_with_tax REAL,
+
+            PRIMARY KEY (device_id, month, year)
+        )
+    """)
+
+    # 📜 登入日誌資料表 (log)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            ip_address TEXT NOT NULL,
+            login_date TEXT NOT NULL,
+            login_time TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def _billing_summary_last_date(conn):
+    """ 原 db_updata.py：get_last_counts 會讀取 billing_summary.last_date """
+    if "last_date" not in _columns(conn, "billing_summary"):
+        conn.execute("ALTER TABLE billing_summary ADD COLUMN last_date TEXT")
+
+
+def _query_indexes(conn):
+    """ 合開群組、抄表與帳單查詢用索引，避免全表掃描 """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_contracts_master ON contracts (master_device_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_device_month ON usage (device_id, month)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_billing_summary_year_month ON billing_summary (year, month)")
+    conn.execute("ANALYZE")
+
+
+MIGRATIONS = [
+    (1, "基本資料表", _base_tables),
+    (2, "billing_summary.last_date", _billing_summary_last_date),
+    (3, "查詢索引", _query_indexes),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ====== 執行 ======
+def current_version(conn):
+    conn.execute(SCHEMA_VERSION_TABLE)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(db_file=DB_FILE):
+    """ 套用尚未執行的版本，回傳本次套用的版本清單；多個 worker 同時啟動時以 BEGIN IMMEDIATE 排隊 """
+    conn = connect(db_file)
+    try:
+        if current_version(conn) >= LATEST_VERSION:
+            return []
+        applied = []
+        for version, name, func in MIGRATIONS:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                    conn.rollback()
+                    continue
+                func(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(version)
+            print(f"🗄️ billing.db 已套用版本 {version}：{name}")
+        return applied
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="billing.db 資料表版本管理")
+    parser.add_argument("command", nargs="?", default="migrate", choices=["migrate", "status"])
+    parser.add_argument("--db", default=DB_FILE)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        conn = connect(args.db)
+        try:
+            current_version(conn)
+            for version, name, applied_at in conn.execute(
+                "SELECT version, name, applied_at FROM schema_version ORDER BY version"
+            ):
+                print(f"{version:>3}  {applied_at}  {name}")
+        finally:
+            conn.close()
+        return
+
+    start = time.perf_counter()
+    applied = migrate(args.db)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"✅ billing.db 版本 {LATEST_VERSION}（本次套用 {len(applied)} 個，{elapsed:.1f} ms）")
+
+
+if __name__ == "__main__":
+    main()
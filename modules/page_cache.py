@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import os
+import threading
+
+from flask import current_app, make_response, request
+from flask_login import current_user
+
+
+# ====== 依版本快取整頁 HTML ======
+class PageCache:
+    """
+    以 (路由, 參數, 使用者, 資料版本) 為鍵的 LRU 快取，總大小不超過 max_bytes。
+    資料版本改變後舊鍵自然不再命中，會隨 LRU 淘汰。
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        body = entry[0]
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+page_cache = PageCache(int(os.environ.get('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024)))
+
+
+def cached_page(version_func, cache=page_cache):
+    """
+    路由裝飾器：同一版本、同一組參數與使用者只渲染一次，之後直接回傳快取內容並附上 ETag，
+    瀏覽器帶 If-None-Match 且內容未變時回 304。
+    version_func() 回傳 None（資料尚未載入）時不快取。
+    version_func 須回傳 view 實際渲染的那份資料的版本：取版本時把快照固定在本次請求（flask.g），
+    view 再從同一份快照讀取，否則背景更新恰好發生在兩者之間時，會把新內容存到舊版本的鍵下。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = version_func()
+            if version is None:
+                return view(*args, **kwargs)
+
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                tuple(sorted(request.form.items(multi=True))),
+                current_user.get_id(),   # 版面右上角顯示使用者名稱
+                version,
+            )
+            entry = cache.get(key)
+            if entry is None:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200 or resp.is_streamed:
+                    return resp
+                body = resp.get_data()
+                entry = (body, hashlib.sha1(body).hexdigest(), resp.mimetype)
+                cache.put(key, entry)
+
+            body, etag, mimetype = entry
+            resp = current_app.response_class(body, mimetype=mimetype)
+            resp.set_etag(etag)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp.make_conditional(request)
+        return wrapper
+    return decorator
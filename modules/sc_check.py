@@ -1,13 +1,14 @@
 from flask import Blueprint, request, jsonify
-import pandas as pd
-import gspread
-from modules.gsheet import client, SHEET_ID
+from modules.lazy import lazy_import
+from modules.sheet_table import SheetTable
+
+pd = lazy_import('pandas')
 
 sc_check_bp = Blueprint('sc_check', __name__)
 
-def get_sc_check_sheet():
-    sh = client.open_by_key(SHEET_ID)
-    return sh.worksheet("硬碟檢測")
+# 「硬碟檢測」分頁快取：依 台芝工作案號 與 門店編號 索引到列號，
+# 更新只寫目標儲存格，刪除在本地平移索引，不必每次下載整張表
+sc_disk_table = SheetTable("硬碟檢測", key="台芝工作案號", index_fields=("門店編號",))
 
 def fetch_and_sync_sc_check(xls):
     """
@@ -54,8 +55,7 @@ def fetch_and_sync_sc_check(xls):
         filtered_im = filtered_im.sort_values(by='sort_time', ascending=False)
 
         # 2. 讀取 Google Sheet 硬碟檢測現有紀錄
-        sheet = get_sc_check_sheet()
-        gs_records = sheet.get_all_records()
+        gs_records = sc_disk_table.records()
         gs_df = pd.DataFrame(gs_records) if gs_records else pd.DataFrame()
 
         existing_keys = set()
@@ -77,7 +77,7 @@ def fetch_and_sync_sc_check(xls):
                     gs_data_map[k] = row
 
         # 3. 比對並將缺少的紀錄 append 至 Google Sheet
-        new_rows_to_append = []
+        new_items = []
         for _, im_row in filtered_im.iterrows():
             key_val = str(im_row.get(case_no_col, '')).strip()
             if not key_val or key_val in existing_keys:
@@ -89,10 +89,6 @@ def fetch_and_sync_sc_check(xls):
             category = str(im_row.get('報修類別', ''))
             content = str(im_row.get(content_col, ''))
 
-            # 新增列至 Google Sheet
-            new_row = [key_val, leave_time, store_id, store_name, category, content, "", "", "", ""]
-            new_rows_to_append.append(new_row)
-            
             gs_data_map[key_val] = {
                 "離場時間": leave_time,
                 "門店編號": store_id,
@@ -101,9 +97,11 @@ def fetch_and_sync_sc_check(xls):
                 "工作內容": content,
                 "SC(1)": "", "SC(2)": "", "TM(1)": "", "TM(2)": ""
             }
+            # 新增列至 Google Sheet（依第 1 列欄名排列，分頁已鏡像時經由 outbox 送出）
+            new_items.append((key_val, gs_data_map[key_val]))
 
-        if new_rows_to_append:
-            sheet.append_rows(new_rows_to_append)
+        if new_items:
+            sc_disk_table.append_many(new_items)
 
         # 4. 僅回傳最新前 5 筆
         result_list = []
@@ -145,32 +143,12 @@ def sc_check_update():
         return jsonify({'status': 'error', 'message': '無效的參數'}), 400
 
     try:
-        sheet = get_sc_check_sheet()
-        all_rows = sheet.get_all_records()
-        headers = sheet.row_values(1)
-        
-        target_row_idx = None
-        target_col_idx = None
-        key_col_idx = 1
-
-        for idx, h in enumerate(headers, 1):
-            clean_h = h.replace('\n', '').replace(' ', '')
-            if '台芝' in clean_h and '工作案號' in clean_h:
-                key_col_idx = idx
-            if h.strip() == col_name:
-                target_col_idx = idx
-
-        if not target_col_idx:
+        headers = sc_disk_table.headers()
+        target = next((h for h in headers if h.strip() == col_name), None)
+        if not target:
             return jsonify({'status': 'error', 'message': f'找不到欄位 {col_name}'}), 400
 
-        for i, row in enumerate(all_rows, start=2):
-            k = str(row.get(headers[key_col_idx - 1], '')).strip()
-            if k == str(case_no).strip():
-                target_row_idx = i
-                break
-
-        if target_row_idx:
-            sheet.update_cell(target_row_idx, target_col_idx, str(value))
+        if sc_disk_table.update(case_no, {target: str(value)}):
             return jsonify({'status': 'success'})
         else:
             return jsonify({'status': 'error', 'message': '找不到對應案號資料'}), 404
@@ -189,22 +167,8 @@ def sc_check_delete():
         return jsonify({'status': 'error', 'message': '缺少案號'}), 400
 
     try:
-        sheet = get_sc_check_sheet()
-        all_rows = sheet.get_all_records()
-        headers = sheet.row_values(1)
-        
-        key_col_idx = 0
-        for idx, h in enumerate(headers):
-            clean_h = h.replace('\n', '').replace(' ', '')
-            if '台芝' in clean_h and '工作案號' in clean_h:
-                key_col_idx = idx
-                break
-
-        for i, row in enumerate(all_rows, start=2):
-            k = str(row.get(headers[key_col_idx], '')).strip()
-            if k == str(case_no).strip():
-                sheet.delete_rows(i)
-                return jsonify({'status': 'success'})
+        if sc_disk_table.delete(case_no):
+            return jsonify({'status': 'success'})
 
         return jsonify({'status': 'error', 'message': '找不到該筆資料可刪除'}), 404
 
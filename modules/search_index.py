@@ -0,0 +1,51 @@
+REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+
+
+# ====== 字元 n-gram 倒排索引（支援中文子字串搜尋） ======
+class NgramIndex:
+    """
+    對每一列的多個欄位文字建立字元 bigram（以及單字元）倒排索引。
+    search(keyword) 先以 posting list 交集找出候選列，再逐格確認子字串，
+    結果與 str.contains(keyword, case=False) 逐列掃描相同，但不必走訪整張表。
+    rows: list[list[str]]，每列為該列要被搜尋的各欄位文字
+    """
+
+    def __init__(self, rows):
+        self.rows = [[str(v).lower() for v in row] for row in rows]
+        self.postings = {}
+        for row_id, cells in enumerate(self.rows):
+            grams = set()
+            for text in cells:
+                grams.update(text)
+                grams.update(text[i:i + 2] for i in range(len(text) - 1))
+            for g in grams:
+                self.postings.setdefault(g, set()).add(row_id)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search(self, keyword):
+        """ 回傳包含 keyword（不分大小寫）的列編號（遞增排序） """
+        keyword = keyword.lower()
+        if not keyword:
+            return list(range(len(self.rows)))
+        if len(keyword) == 1:
+            grams = {keyword}
+        else:
+            grams = {keyword[i:i + 2] for i in range(len(keyword) - 1)}
+
+        lists = sorted((self.postings.get(g, set()) for g in grams), key=len)
+        candidates = set(lists[0])
+        for posting in lists[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+        return sorted(
+            i for i in candidates
+            if any(keyword in text for text in self.rows[i])
+        )
+
+
+def is_plain_text(keyword):
+    """ str.contains 預設以正規表示式比對；含特殊字元時呼叫端應退回逐列掃描 """
+    return not any(ch in REGEX_SPECIAL for ch in keyword)
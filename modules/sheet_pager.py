@@ -0,0 +1,110 @@
+import math
+import os
+import threading
+import time
+
+from modules.gsheet import get_worksheet, worksheets
+from modules.sheet_sync import sheet_mirror
+
+SHEET_PAGER_TTL = int(os.environ.get('SHEET_PAGER_TTL_SECONDS', 30))
+PROBE_ROWS = 50
+
+
+# ====== 只往下追加的分頁：由新到舊分頁讀取 ======
+class SheetPager:
+    """
+    記住分頁最後一筆資料的列號，每頁只讀需要的 A1 範圍（從表尾往回算），
+    不下載整張表；頁面時間與總筆數無關。
+    - 最後一列：第一次以分頁 metadata 的格線列數為上限做二分搜尋（每次只讀 A 欄一格），
+      之後 TTL 到期時只讀「已知最後一列起 PROBE_ROWS 列」確認是否有新資料；
+    - 分頁已由 sheet_mirror 鏡像時，筆數與內容都直接查本地 SQLite。
+    """
+
+    def __init__(self, title, ttl=SHEET_PAGER_TTL):
+        self.title = title
+        self.ttl = ttl
+        self._headers = None
+        self._last = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def expire(self):
+        self._checked_at = None
+
+    def _filled(self, ws, row):
+        return bool(ws.get(f"A{row}"))
+
+    def _search_last(self, ws, lo, hi=None):
+        """
+        lo 為已知有資料的列，在 (lo, hi) 之間二分搜尋最後一筆資料；
+        hi 省略時以分頁 metadata 的格線列數為上限。
+        """
+        if hi is None:
+            worksheets.invalidate()   # 取得最新的格線列數
+            hi = worksheets.resolve(self.title).row_count
+            if hi <= lo or self._filled(ws, hi):
+                return max(hi, lo)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self._filled(ws, mid):
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def _refresh_last(self, ws):
+        if self._last is None:
+            self._last = self._search_last(ws, 1)
+            return
+        # 已知最後一列起讀一小段：第一格空了代表有刪列，整段都滿代表新增超過一段，都改用二分搜尋
+        probe = ws.get(f"A{self._last}:A{self._last + PROBE_ROWS}")
+        if not probe or not probe[0]:
+            self._last = self._search_last(ws, 1, self._last)
+        elif len(probe) > PROBE_ROWS:
+            self._last = self._search_last(ws, self._last + PROBE_ROWS)
+        else:
+            self._last += len(probe) - 1
+
+    def _records(self, rows):
+        from gspread.utils import numericise_all
+        width = len(self._headers)
+        return [
+            dict(zip(self._headers, numericise_all(list(r) + [""] * (width - len(r)))))
+            for r in rows
+        ]
+
+    def page(self, page, per_page):
+        """ 回傳 (當頁紀錄（新到舊）, 修正後頁碼, 總頁數, 總筆數) """
+        with self._lock:
+            if sheet_mirror.synced(self.title):
+                last = sheet_mirror.last_row(self.title)
+            else:
+                ws = get_worksheet(self.title)
+                if self._headers is None:
+                    self._headers = ws.row_values(1)
+                now = time.monotonic()
+                if self._last is None or self._checked_at is None or now - self._checked_at > self.ttl:
+                    self._refresh_last(ws)
+                    self._checked_at = now
+                last = self._last
+
+            total = max(last - 1, 0)
+            total_pages = math.ceil(total / per_page) if total > 0 else 1
+            page = min(max(page, 1), total_pages)
+            if total == 0:
+                return [], page, total_pages, total
+
+            # 第 1 頁是最後 per_page 列，依此往回推
+            end = last - (page - 1) * per_page
+            start = max(end - per_page + 1, 2)
+            if sheet_mirror.synced(self.title):
+                headers, rows = sheet_mirror.values_from(self.title, start, end)
+                self._headers = headers
+            else:
+                from gspread.utils import rowcol_to_a1
+                end_cell = rowcol_to_a1(end, max(len(self._headers), 1))
+                rows = ws.get(f"A{start}:{end_cell}")
+                rows = rows + [[]] * (end - start + 1 - len(rows))   # 範圍內的空白列也算一筆
+            records = self._records(rows)
+            records.reverse()   # 讓最新的排在前面
+            return records, page, total_pages, total
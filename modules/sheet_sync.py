@@ -0,0 +1,638 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+from modules.db import connect, get_db
+from modules.gsheet import get_worksheet, worksheets
+
+DB_FILE = "billing.db"
+SHEET_SYNC_SECONDS = int(os.environ.get('SHEET_SYNC_SECONDS', 60))
+SYNC_LOCK_SECONDS = 30   # 同步租約長度；同步期間每送出一批就續約，worker 中途結束時其他 worker 可較快接手
+OUTBOX_CLAIM_SECONDS = 300   # outbox 列送出期間的認領時間（需長於 sheets_scheduler 排隊 + 重試的最長時間）
+
+# 鏡像的分頁 → 辨識同一筆資料的 key 欄位（None 表示以列號辨識，適用只會往下追加的分頁）
+MIRRORED_TABS = {
+    'contracts': 'device_id',
+    'customers': 'device_id',
+    '硬碟檢測': '門店編號',
+    '硬碟統計': None,
+    'log': None,
+}
+# 個人備註分頁（/billing/person/<sheet>）
+PERSON_TABS = [
+    t.strip() for t in os.environ.get('SHEET_SYNC_PERSON_TABS', '狄澤洋,湯家瑋,吳宗鴻,劉柏均').split(',')
+    if t.strip()
+]
+for _tab in PERSON_TABS:
+    MIRRORED_TABS.setdefault(_tab, '設備代號')
+
+# 同步時一併更新的既有資料表（get_related_devices 等直接以 SQL 查詢），以 device_id 對應
+TYPED_TABLES = {'contracts': 'contracts', 'customers': 'customers'}
+
+
+# ====== 多 worker 租約（存在 billing.db，gunicorn 各 worker 共用） ======
+LEASE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sheet_sync_state (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        until REAL NOT NULL
+    );
+"""
+
+
+def lease_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lease(conn, name, seconds):
+    """ 租約未被持有、已過期或本來就是自己持有時取得（延長）並回傳 True """
+    now = time.time()
+    cur = conn.execute("""
+        INSERT INTO sheet_sync_state (name, owner, until) VALUES (?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, until = excluded.until
+        WHERE sheet_sync_state.until < ? OR sheet_sync_state.owner = excluded.owner
+    """, (name, lease_owner(), now + seconds, now))
+    return cur.rowcount == 1
+
+
+def release_lease(conn, name):
+    conn.execute("UPDATE sheet_sync_state SET until = 0 WHERE name = ? AND owner = ?", (name, lease_owner()))
+
+
+class LeaseLost(Exception):
+    """ 同步途中租約被其他 worker 取得，或要送出的操作已被其他 worker 送出 """
+
+
+def _norm(value):
+    return str(value).strip()
+
+
+def _cell_text(value):
+    """ 本地寫入的值轉成 Sheet 顯示的文字（FORMATTED_VALUE） """
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _pad(rows):
+    """ 與 get_all_values() 相同，補齊成矩形 """
+    if not rows:
+        return []
+    width = max(len(r) for r in rows)
+    return [list(r) + [""] * (width - len(r)) for r in rows]
+
+
+def _row_hash(row):
+    return hashlib.sha1(json.dumps(row, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _key_index(headers, key_field):
+    if key_field is None or key_field not in headers:
+        return None
+    return headers.index(key_field)
+
+
+def _row_keys(rows, key_idx):
+    """ 每筆資料列的識別 key；key 重複時第二筆起加上 #n，第一筆維持原值供查找 """
+    keys, seen = [], {}
+    for row_num, r in enumerate(rows[1:], start=2):
+        if key_idx is None:
+            keys.append(str(row_num))
+            continue
+        k = _norm(r[key_idx]) if key_idx < len(r) else ""
+        n = seen.get(k, 0)
+        seen[k] = n + 1
+        keys.append(k if n == 0 else f"{k}#{n}")
+    return keys
+
+
+def _find_row(rows, key_idx, key):
+    """ 回傳第一筆 key 欄位相符的 Sheet 列號（rows[0] 為標題列） """
+    if key_idx is None:
+        return None
+    key = _norm(key)
+    for row_num, r in enumerate(rows[1:], start=2):
+        if key_idx < len(r) and _norm(r[key_idx]) == key:
+            return row_num
+    return None
+
+
+def _apply_to_rows(rows, key_idx, op, payload):
+    """
+    將一筆寫入操作套用到記憶體中的分頁內容（二維陣列，含標題列），
+    回傳受影響的 Sheet 列號；patch / delete 找不到該列時回傳 None。
+    """
+    if op == 'append':
+        width = len(rows[0]) if rows else 0
+        first = len(rows) + 1
+        for r in payload['rows']:
+            text = [_cell_text(v) for v in r]
+            rows.append(text + [""] * (width - len(text)))
+        return first
+
+    row_num = _find_row(rows, key_idx, payload['key'])
+    if row_num is None:
+        return None
+    if op == 'patch':
+        row = rows[row_num - 1]
+        for col, value in payload['cells'].items():
+            col = int(col)
+            while len(row) < col:
+                row.append("")
+            row[col - 1] = _cell_text(value)
+    elif op == 'delete':
+        del rows[row_num - 1]
+    return row_num
+
+
+def _push(ws, op, batch):
+    """
+    將同一分頁、同一種寫入操作的多筆 (payload, 列號) 一次送到 Google Sheet：
+    patch 合併成一次 batch_update、append 合併成一次 append_rows；delete 每次只送一筆。
+    """
+    from gspread.utils import rowcol_to_a1
+
+    option = batch[0][0].get('value_input_option', 'RAW')
+    if op == 'append':
+        ws.append_rows([r for payload, _ in batch for r in payload['rows']], value_input_option=option)
+    elif op == 'patch':
+        cells = {}   # 同一格寫多次時保留最後一次
+        for payload, row_num in batch:
+            for col, value in payload['cells'].items():
+                cells[(row_num, int(col))] = value
+        if cells:
+            ws.batch_update(
+                [{'range': rowcol_to_a1(row, col), 'values': [[value]]} for (row, col), value in cells.items()],
+                value_input_option=option
+            )
+    elif op == 'delete':
+        for _, row_num in batch:
+            ws.delete_rows(row_num)
+
+
+# ====== Google Sheet 分頁的本地 SQLite 鏡像 ======
+class SheetMirror:
+    """
+    將 Google Sheet 分頁鏡像到 billing.db：
+      - 背景每 interval 秒以一次 values_batch_get 讀回所有分頁，依列內容雜湊只寫入有變動的列；
+      - 本程式的寫入先套用到本地鏡像並放進 sheet_outbox，再由背景執行緒依序送出；
+      - 讀取直接查本地 SQLite，Google Sheet 無法連線時頁面仍可使用。
+    分頁尚未完成第一次同步（或 interval <= 0 停用）時，讀寫都直接走 Google Sheet API。
+    多個 worker 共用同一個 billing.db，以 sheet_sync_state 的租約確保同一時間只有一個在同步。
+    """
+
+    def __init__(self, db_file=DB_FILE, tabs=None, interval=SHEET_SYNC_SECONDS):
+        self.db_file = db_file
+        self.tabs = dict(MIRRORED_TABS if tabs is None else tabs)
+        self.interval = interval
+        self._schema_ready = False
+        self._wake = threading.Event()
+        self._thread_pid = None
+        self._thread_lock = threading.Lock()
+
+    # --- 資料表 ---
+    def _connect(self):
+        conn = connect(self.db_file)
+        if not self._schema_ready:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sheet_tabs (
+                    tab TEXT PRIMARY KEY,
+                    headers TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    synced_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS sheet_rows (
+                    tab TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    row_num INTEGER NOT NULL,
+                    row_hash TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (tab, key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_sheet_rows_row_num ON sheet_rows (tab, row_num);
+                CREATE TABLE IF NOT EXISTS sheet_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tab TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                );
+            """ + LEASE_SCHEMA)
+            outbox_cols = {r[1] for r in conn.execute("PRAGMA table_info(sheet_outbox)")}
+            for col, decl in (("claimed_by", "TEXT"), ("claimed_until", "REAL NOT NULL DEFAULT 0")):
+                if col not in outbox_cols:
+                    conn.execute(f"ALTER TABLE sheet_outbox ADD COLUMN {col} {decl}")
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def _reader(self):
+        """ 唯讀查詢沿用請求 / 執行緒共用的連線（get_db），不必每次 connect；不要在上面開交易 """
+        if not self._schema_ready:
+            self._connect().close()
+        return get_db(self.db_file)
+
+    # --- 讀取 ---
+    def version(self, tab):
+        """ 分頁內容版本（每次有變動 +1）；尚未同步過回傳 None """
+        if self.interval <= 0 or tab not in self.tabs:
+            return None
+        row = self._reader().execute("SELECT version FROM sheet_tabs WHERE tab = ?", (tab,)).fetchone()
+        return row[0] if row else None
+
+    def synced(self, tab):
+        return self.version(tab) is not None
+
+    def _load(self, conn, tab):
+        row = conn.execute("SELECT headers FROM sheet_tabs WHERE tab = ?", (tab,)).fetchone()
+        headers = json.loads(row[0]) if row else []
+        data = conn.execute(
+            "SELECT data FROM sheet_rows WHERE tab = ? ORDER BY row_num", (tab,)
+        ).fetchall()
+        return ([headers] if headers else []) + [json.loads(d) for d, in data]
+
+    def values(self, tab):
+        """ 與 ws.get_all_values() 相同格式（含標題列） """
+        if not self.synced(tab):
+            return get_worksheet(tab).get_all_values()
+        return self._load(self._reader(), tab)
+
+    def values_from(self, tab, row_num, last=None):
+        """ 回傳 (標題列, 第 row_num 列起（到第 last 列）的資料列)；只往下追加的分頁用來增量/分段讀取 """
+        sql = "SELECT data FROM sheet_rows WHERE tab = ? AND row_num >= ?"
+        params = [tab, row_num]
+        if last is not None:
+            sql += " AND row_num <= ?"
+            params.append(last)
+        conn = self._reader()
+        row = conn.execute("SELECT headers FROM sheet_tabs WHERE tab = ?", (tab,)).fetchone()
+        data = conn.execute(sql + " ORDER BY row_num", params).fetchall()
+        return (json.loads(row[0]) if row else []), [json.loads(d) for d, in data]
+
+    def last_row(self, tab):
+        """ 最後一筆資料的列號（只有標題列時為 1） """
+        row = self._reader().execute("SELECT MAX(row_num) FROM sheet_rows WHERE tab = ?", (tab,)).fetchone()
+        return row[0] or 1
+
+    def records(self, tab):
+        """ 與 ws.get_all_records() 相同格式（數字字串轉為 int/float） """
+        if not self.synced(tab):
+            return get_worksheet(tab).get_all_records()
+        from gspread.utils import numericise_all
+
+        rows = self.values(tab)
+        if len(rows) < 2:
+            return []
+        headers = rows[0]
+        return [dict(zip(headers, numericise_all(r))) for r in rows[1:]]
+
+    # --- 寫入 ---
+    def _key_field(self, tab, payload):
+        return payload.get('key_field') or self.tabs.get(tab)
+
+    def _headers(self, tab):
+        if not self.synced(tab):
+            return worksheets.resolve(tab).row_values(1)
+        row = self._reader().execute("SELECT headers FROM sheet_tabs WHERE tab = ?", (tab,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    @staticmethod
+    def _patch_payload(headers, key, fields, cells, value_input_option, key_field):
+        cells = dict(cells or {})
+        for field, value in (fields or {}).items():
+            if field in headers:
+                cells.setdefault(headers.index(field) + 1, value)
+        payload = {'key': _norm(key), 'cells': cells, 'value_input_option': value_input_option}
+        if key_field:
+            payload['key_field'] = key_field
+        return payload
+
+    def patch(self, tab, key, fields=None, cells=None, value_input_option='RAW', key_field=None):
+        """
+        更新 key 欄位為 key 的第一筆資料：fields 以欄名、cells 以欄號（1 起算）指定，
+        不存在的欄名略過。找不到該筆資料時回傳 False。
+        key_field 指定 key 欄位（省略時使用 MIRRORED_TABS 的設定）。
+        """
+        headers = self._headers(tab) if fields else []
+        payload = self._patch_payload(headers, key, fields, cells, value_input_option, key_field)
+        return self._write(tab, 'patch', payload)
+
+    def patch_many(self, tab, updates, value_input_option='RAW', key_field=None):
+        """ updates 為 {key: {欄名: 值}}，在同一個交易中寫入鏡像；回傳找不到的 key """
+        headers = self._headers(tab)
+        keys = list(updates)
+        results = self.write_many(tab, [
+            ('patch', self._patch_payload(headers, key, updates[key], None, value_input_option, key_field))
+            for key in keys
+        ])
+        return [key for key, ok in zip(keys, results) if not ok]
+
+    def delete(self, tab, key, key_field=None):
+        payload = {'key': _norm(key)}
+        if key_field:
+            payload['key_field'] = key_field
+        return self._write(tab, 'delete', payload)
+
+    def append(self, tab, row, value_input_option='RAW'):
+        return self.append_rows(tab, [row], value_input_option)
+
+    def append_rows(self, tab, rows, value_input_option='RAW'):
+        return self._write(tab, 'append', {'rows': [list(r) for r in rows], 'value_input_option': value_input_option})
+
+    def _write(self, tab, op, payload):
+        return self.write_many(tab, [(op, payload)])[0]
+
+    def write_many(self, tab, ops):
+        """
+        [(op, payload)] 在同一個交易中套用到鏡像並放進 outbox，回傳各筆是否成功（patch / delete 找不到該列為 False）。
+        分頁尚未鏡像時逐筆直接寫入 Google Sheet。
+        """
+        if not self.synced(tab):
+            return [self._write_direct(tab, op, payload) for op, payload in ops]
+
+        results = []
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")   # 讀取到寫回之間不讓其他 worker 寫入同一份鏡像
+            with conn:
+                rows = self._load(conn, tab)
+                created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                for op, payload in ops:
+                    key_idx = _key_index(rows[0] if rows else [], self._key_field(tab, payload))
+                    ok = _apply_to_rows(rows, key_idx, op, payload) is not None
+                    results.append(ok)
+                    if ok:
+                        conn.execute(
+                            "INSERT INTO sheet_outbox (tab, op, payload, created_at) VALUES (?, ?, ?, ?)",
+                            (tab, op, json.dumps(payload, ensure_ascii=False), created_at)
+                        )
+                if any(results):
+                    self._store(conn, tab, rows, touch=False)
+        finally:
+            conn.close()
+        if any(results):
+            self._wake.set()   # 盡快由背景送出
+        return results
+
+    def _write_direct(self, tab, op, payload):
+        """ 尚未鏡像的分頁：直接寫入 Google Sheet（只讀 key 欄定位，不下載整張表） """
+        ws = get_worksheet(tab)
+        row_num = None
+        if op != 'append':
+            headers = worksheets.resolve(tab).row_values(1)
+            key_idx = _key_index(headers, self._key_field(tab, payload))
+            if key_idx is None:
+                return False
+            column = ws.col_values(key_idx + 1)
+            row_num = _find_row([[v] for v in column], 0, payload['key'])
+            if row_num is None:
+                return False
+        _push(ws, op, [(payload, row_num)])
+        return True
+
+    # --- 同步 ---
+    def _store(self, conn, tab, rows, touch=True):
+        """ 以列內容雜湊比對，只寫入新增/變動/移除的列；回傳是否有變動 """
+        headers = rows[0] if rows else []
+        key_idx = _key_index(headers, self.tabs.get(tab))
+        keys = _row_keys(rows, key_idx)
+
+        old = {k: (rn, h) for k, rn, h in conn.execute(
+            "SELECT key, row_num, row_hash FROM sheet_rows WHERE tab = ?", (tab,))}
+        upserts, moves, seen = [], [], set()
+        for row_num, (k, r) in enumerate(zip(keys, rows[1:]), start=2):
+            h = _row_hash(r)
+            seen.add(k)
+            prev = old.get(k)
+            if prev is None or prev[1] != h:
+                upserts.append((tab, k, row_num, h, json.dumps(r, ensure_ascii=False)))
+            elif prev[0] != row_num:
+                moves.append((row_num, tab, k))
+        removed = [k for k in old if k not in seen]
+
+        prev_headers = conn.execute("SELECT headers FROM sheet_tabs WHERE tab = ?", (tab,)).fetchone()
+        headers_json = json.dumps(headers, ensure_ascii=False)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if not (upserts or moves or removed) and prev_headers and prev_headers[0] == headers_json:
+            if touch:
+                conn.execute("UPDATE sheet_tabs SET synced_at = ? WHERE tab = ?", (now, tab))
+            return False
+
+        conn.executemany("DELETE FROM sheet_rows WHERE tab = ? AND key = ?", [(tab, k) for k in removed])
+        conn.executemany("UPDATE sheet_rows SET row_num = ? WHERE tab = ? AND key = ?", moves)
+        conn.executemany(
+            "INSERT OR REPLACE INTO sheet_rows (tab, key, row_num, row_hash, data) VALUES (?, ?, ?, ?, ?)",
+            upserts
+        )
+        conn.execute("""
+            INSERT INTO sheet_tabs (tab, headers, version, synced_at) VALUES (?, ?, 1, ?)
+            ON CONFLICT(tab) DO UPDATE SET headers = excluded.headers, version = version + 1,
+                synced_at = COALESCE(?, synced_at)
+        """, (tab, headers_json, now, now if touch else None))
+
+        if tab in TYPED_TABLES:
+            self._sync_typed(conn, TYPED_TABLES[tab], headers, [json.loads(u[4]) for u in upserts if '#' not in u[1]],
+                             [k for k in removed if '#' not in k and k and k not in seen])
+        return True
+
+    def _sync_typed(self, conn, table, headers, rows, removed_keys):
+        """ 變動列同步到既有資料表（只更新兩邊都有的欄位，不動本地獨有欄位） """
+        from gspread.utils import numericise_all
+
+        table_cols = {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')}
+        if 'device_id' not in headers or 'device_id' not in table_cols:
+            return
+        cols = [c for c in headers if c in table_cols and c != 'device_id']
+        key_idx = headers.index('device_id')
+        for r in rows:
+            device_id = _norm(r[key_idx])
+            if not device_id:
+                continue
+            values = dict(zip(headers, numericise_all(r)))
+            params = [values[c] for c in cols]
+            cur = conn.execute(
+                f'UPDATE "{table}" SET ' + ', '.join(f'"{c}" = ?' for c in cols) + ' WHERE TRIM(device_id) = ?',
+                params + [device_id]
+            ) if cols else conn.execute(f'SELECT 1 FROM "{table}" WHERE TRIM(device_id) = ?', (device_id,))
+            if (cols and cur.rowcount == 0) or (not cols and cur.fetchone() is None):
+                conn.execute(
+                    f'INSERT INTO "{table}" (device_id' + ''.join(f', "{c}"' for c in cols) + ') VALUES (?'
+                    + ', ?' * len(cols) + ')',
+                    [device_id] + params
+                )
+        conn.executemany(f'DELETE FROM "{table}" WHERE TRIM(device_id) = ?', [(k,) for k in removed_keys])
+
+    def _send(self, conn, tab, op, group, pending):
+        """
+        送出同一組操作，送出期間不持有 SQLite 交易（Google Sheets 慢或失敗時不擋住其他 worker 寫入）：
+          1. 短交易：續約並認領這些 outbox 列（claimed_by / claimed_until）；
+          2. 不開交易呼叫 Google Sheets；
+          3. 短交易：成功則刪除這些列，失敗則解除認領並記錄錯誤，該分頁後面的操作保留到下一輪。
+        租約已被取得，或這些列已不在 outbox / 正由其他 worker 認領時放棄，不重複送出。
+        """
+        owner = lease_owner()
+        ids = [op_id for op_id, _, _ in group]
+        with conn:
+            if not acquire_lease(conn, 'lock', SYNC_LOCK_SECONDS):
+                raise LeaseLost("同步租約已被其他 worker 取得")
+            now = time.time()
+            claimed = conn.executemany("""
+                UPDATE sheet_outbox SET claimed_by = ?, claimed_until = ?
+                WHERE id = ? AND (claimed_by IS NULL OR claimed_by = ? OR claimed_until < ?)
+            """, [(owner, now + OUTBOX_CLAIM_SECONDS, op_id, owner, now) for op_id in ids]).rowcount
+            if claimed != len(ids):
+                raise LeaseLost(f"「{tab}」的待送出操作已由其他 worker 送出或正在送出")
+
+        try:
+            targets = [(payload, row_num) for _, payload, row_num in group if row_num is not None]
+            if targets:   # 該列已被他人刪除的操作直接略過
+                _push(get_worksheet(tab), op, targets)
+        except Exception as e:
+            pending.add(tab)
+            with conn:
+                conn.executemany("""
+                    UPDATE sheet_outbox SET claimed_by = NULL, claimed_until = 0,
+                        attempts = attempts + 1, last_error = ?
+                    WHERE id = ? AND claimed_by = ?
+                """, [(str(e)[:500], op_id, owner) for op_id in ids])
+            print(f"⚠️ 寫入 Google Sheet「{tab}」失敗，稍後重試: {e}")
+            return
+        with conn:
+            conn.executemany("DELETE FROM sheet_outbox WHERE id = ? AND claimed_by = ?", [(op_id, owner) for op_id in ids])
+
+    def _flush(self, live):
+        """
+        依序送出 outbox，相鄰的同分頁同種操作合併成一次 API 呼叫；
+        某分頁送出失敗時，該分頁後面的操作保留到下一輪（維持順序）。
+        """
+        pending = set()
+        conn = self._connect()
+        try:
+            ops = conn.execute("SELECT id, tab, op, payload FROM sheet_outbox ORDER BY id").fetchall()
+            group, group_key = [], None
+            for op_id, tab, op, payload in ops:
+                payload = json.loads(payload)
+                key = (tab, op, payload.get('value_input_option', 'RAW'))
+                if group and key != group_key:
+                    self._send(conn, group_key[0], group_key[1], group, pending)
+                    group = []
+                if tab in pending:
+                    continue
+                try:
+                    rows = live[tab]
+                    key_idx = _key_index(rows[0] if rows else [], self._key_field(tab, payload))
+                    row_num = _apply_to_rows(rows, key_idx, op, payload)
+                except Exception as e:
+                    pending.add(tab)
+                    print(f"⚠️ 寫入 Google Sheet「{tab}」失敗，稍後重試: {e}")
+                    continue
+                group_key = key
+                group.append((op_id, payload, row_num))
+                if op == 'delete':   # 刪除會讓後面的列號移動，不合併
+                    self._send(conn, tab, op, group, pending)
+                    group = []
+            if group:
+                self._send(conn, group_key[0], group_key[1], group, pending)
+        finally:
+            conn.close()
+        return pending
+
+    def sync(self):
+        """ 讀回所有分頁 → 送出 outbox → 寫入鏡像；回傳有變動的分頁 """
+        from gspread.utils import absolute_range_name
+
+        titles = [t for t in self.tabs if t in set(worksheets.titles())]
+        if not titles:
+            return []
+        resp = worksheets.batch_get([absolute_range_name(t) for t in titles])
+        live = {t: _pad(vr.get('values') or []) for t, vr in zip(titles, resp.get('valueRanges', []))}
+
+        try:
+            pending = self._flush(live)
+        except LeaseLost as e:
+            print(f"⚠️ Google Sheet 同步中止: {e}")
+            return []
+
+        changed = []
+        conn = self._connect()
+        try:
+            for tab in titles:
+                if tab in pending or tab not in live:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if not acquire_lease(conn, 'lock', SYNC_LOCK_SECONDS):   # 每個分頁寫入前續約
+                        conn.rollback()
+                        print("⚠️ Google Sheet 同步中止: 同步租約已被其他 worker 取得")
+                        break
+                    # 讀回之後才寫入的操作還在 outbox，live 不含它，保留本地內容到下一輪
+                    if conn.execute("SELECT 1 FROM sheet_outbox WHERE tab = ? LIMIT 1", (tab,)).fetchone() is None:
+                        if self._store(conn, tab, live[tab]):
+                            changed.append(tab)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        finally:
+            conn.close()
+        return changed
+
+    # --- 背景執行緒（多 worker 以租約協調） ---
+    def run_once(self):
+        """ 取得租約後，有待送出的寫入或距上次讀回已超過 interval 時執行一次 sync() """
+        conn = self._connect()
+        try:
+            with conn:
+                if not acquire_lease(conn, 'lock', SYNC_LOCK_SECONDS):
+                    return None
+            try:
+                last = conn.execute("SELECT until FROM sheet_sync_state WHERE name = 'pulled'").fetchone()
+                has_pending = conn.execute("SELECT 1 FROM sheet_outbox LIMIT 1").fetchone() is not None
+                if not has_pending and last and time.time() - last[0] < self.interval:
+                    return []
+                changed = self.sync()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sheet_sync_state (name, owner, until) VALUES ('pulled', ?, ?)",
+                        (lease_owner(), time.time())
+                    )
+                return changed
+            finally:
+                with conn:
+                    release_lease(conn, 'lock')
+        finally:
+            conn.close()
+
+    def start(self):
+        """ 每個 worker 行程啟動一條背景同步執行緒（gunicorn fork 後也會各自啟動） """
+        if self.interval <= 0:
+            return
+        if self._thread_pid == os.getpid():   # 已啟動時不必取鎖（每個請求都會呼叫）
+            return
+        with self._thread_lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._sync_loop, daemon=True).start()
+
+    def _sync_loop(self):
+        while True:
+            try:
+                changed = self.run_once()
+                if changed:
+                    print(f"🔄 已同步 Google Sheet 分頁：{', '.join(changed)}")
+            except Exception as e:
+                print(f"⚠️ Google Sheet 同步失敗: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+sheet_mirror = SheetMirror()
@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+
+from modules.gsheet import get_worksheet, header_columns, patch_row, patch_rows
+from modules.sheet_sync import sheet_mirror
+
+SHEET_TABLE_TTL = int(os.environ.get('SHEET_TABLE_TTL_SECONDS', 60))
+
+
+def _norm(value):
+    return str(value).strip()
+
+
+def _compact(header):
+    return str(header).replace('\n', '').replace(' ', '').strip()
+
+
+def _match(headers, field):
+    """ 實際的欄名（Sheet 上的欄名可能含換行或空白，例如「台芝\n工作案號」） """
+    if field in headers:
+        return field
+    return next((h for h in headers if _compact(h) == _compact(field)), field)
+
+
+def _as_read_back(value):
+    """ 寫入值轉成 get_all_records() 讀回時的型態（數字字串會轉為 int/float） """
+    from gspread.utils import numericise
+    return numericise(value) if isinstance(value, str) else value
+
+
+# ====== Google Sheet 分頁快取（依 key 欄位索引） ======
+class SheetTable:
+    """
+    整張分頁以 get_all_records() 讀一次後放在記憶體，依 key 欄位（去除前後空白）建立索引，
+    並記錄每筆資料所在的列號；TTL 內的查詢都是 dict 查找，不呼叫 API。
+    本程式自己的 update / delete 會同步修補快取，append 則讓快取失效（下次查詢重新讀取）。
+    分頁已由 sheet_mirror 鏡像時改讀本地 SQLite，依鏡像版本（而非 TTL）決定是否重建索引，
+    寫入也交給鏡像的 outbox 在背景送出。
+    """
+
+    def __init__(self, title, key='device_id', index_fields=(), ttl=SHEET_TABLE_TTL):
+        self.title = title
+        self.key = key
+        self.index_fields = tuple(index_fields)
+        self.ttl = ttl
+        self._records = []
+        self._headers = []
+        self._by_key = {}
+        self._by_field = {}
+        self._loaded_at = None
+        self._version = None
+        self._lock = threading.RLock()
+
+    # --- 載入與索引 ---
+    def _stale(self):
+        if self._loaded_at is None:
+            return True
+        version = sheet_mirror.version(self.title)
+        if version is not None:
+            return version != self._version
+        return time.monotonic() - self._loaded_at > self.ttl
+
+    def _header(self, field):
+        return _match(self._headers, field)
+
+    def _fields(self, data):
+        """ {欄名: 值} 的欄名換成分頁上實際的欄名 """
+        return {self._header(field): value for field, value in data.items()}
+
+    def _reindex(self):
+        key = self._header(self.key)
+        self._by_key = {}
+        self._by_field = {field: {} for field in self.index_fields}
+        for pos, r in enumerate(self._records):
+            self._by_key.setdefault(_norm(r.get(key, "")), pos)   # 與原本 next() 相同，取第一筆
+            for field in self.index_fields:
+                self._by_field[field].setdefault(_norm(r.get(self._header(field), "")), []).append(pos)
+
+    def reload(self):
+        with self._lock:
+            self._version = sheet_mirror.version(self.title)
+            records = sheet_mirror.records(self.title)
+            if records:
+                self._headers = list(records[0].keys())
+            elif self._version is not None:
+                self._headers = (sheet_mirror.values(self.title) or [[]])[0]
+            else:
+                self._headers = get_worksheet(self.title).row_values(1)
+            self._records = records
+            self._reindex()
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _ensure(self):
+        if self._stale():
+            self.reload()
+
+    # --- 查詢（回傳複本，呼叫端可自由修改） ---
+    def headers(self):
+        with self._lock:
+            self._ensure()
+            return list(self._headers)
+
+    def records(self):
+        with self._lock:
+            self._ensure()
+            return [dict(r) for r in self._records]
+
+    def get(self, key):
+        with self._lock:
+            self._ensure()
+            pos = self._by_key.get(_norm(key))
+            return dict(self._records[pos]) if pos is not None else None
+
+    def find(self, field, value):
+        with self._lock:
+            self._ensure()
+            return [dict(self._records[pos]) for pos in self._by_field[field].get(_norm(value), [])]
+
+    # --- 寫入（未鏡像時直接寫 Sheet，並修補快取） ---
+    def _position(self, key, field=None):
+        """ field 省略時依 key 欄位查找，否則依 index_fields 中的 field（取第一筆） """
+        if field is None or field == self.key:
+            return self._by_key.get(_norm(key))
+        positions = self._by_field[field].get(_norm(key))
+        return positions[0] if positions else None
+
+    def _locate(self, ws, key, field=None):
+        """
+        回傳 key 目前的 (位置, 列號)。寫入前先讀一次該列的 key 儲存格，確認沒有被其他 worker
+        或手動編輯插入/刪除列而錯位；不一致時重新載入整張表再確認一次，仍不一致時回傳 (None, None)。
+        """
+        self._ensure()
+        key_col = self._headers.index(self._header(field or self.key)) + 1
+        for attempt in range(2):
+            if attempt:
+                self.reload()
+            pos = self._position(key, field)
+            if pos is None:
+                return None, None
+            if _norm(ws.cell(pos + 2, key_col).value or "") == _norm(key):
+                return pos, pos + 2
+        print(f"⚠️ {self.title} 找不到與索引一致的 {key} 資料列，不寫入")
+        return None, None
+
+    def update(self, key, data, field=None, value_input_option='USER_ENTERED'):
+        """
+        以一次範圍寫入更新 key 所在列的多個欄位；field 指定改用 index_fields 中的欄位查找。
+        找不到 key 時回傳 False；寫入 Google Sheet 失敗時重新拋出例外（不當成找不到，避免呼叫端改為新增一列）。
+        """
+        with self._lock:
+            if sheet_mirror.synced(self.title):
+                self._ensure()
+                return sheet_mirror.patch(self.title, key, fields=self._fields(data),
+                                          value_input_option=value_input_option,
+                                          key_field=self._header(field or self.key))
+            ws = get_worksheet(self.title)
+            pos, row = self._locate(ws, key, field)
+            if pos is None:
+                return False
+            data = self._fields(data)
+            try:
+                written = patch_row(self.title, row, data, header_columns(self._headers), value_input_option)
+            except Exception as e:
+                print(f"⚠️ {self.title} 第 {row} 列更新失敗: {e}")
+                self.invalidate()
+                raise
+            record = self._records[pos]
+            for field in written:
+                record[field] = _as_read_back(data[field])
+            self._reindex()
+            return True
+
+    def update_many(self, updates, field=None, value_input_option='USER_ENTERED'):
+        """
+        updates 為 {key: {欄名: 值}}：依索引定位各列，只讀一次 key 欄確認沒有錯位，
+        全部以一次 batch_update 寫入。回傳找不到的 key。
+        """
+        with self._lock:
+            self._ensure()
+            updates = {key: self._fields(data) for key, data in updates.items()}
+            if sheet_mirror.synced(self.title):
+                return sheet_mirror.patch_many(self.title, updates, value_input_option,
+                                               key_field=self._header(field or self.key))
+            ws = get_worksheet(self.title)
+            key_col = self._headers.index(self._header(field or self.key)) + 1
+            column = ws.col_values(key_col)
+
+            def positions():
+                found = {}
+                for key in updates:
+                    pos = self._position(key, field)
+                    if pos is not None:
+                        found[key] = pos
+                return found
+
+            def shifted(found):
+                return [key for key, pos in found.items()
+                        if pos + 1 >= len(column) or _norm(column[pos + 1]) != _norm(key)]
+
+            found = positions()
+            if shifted(found):
+                self.reload()
+                column = ws.col_values(key_col)
+                found = positions()
+                for key in shifted(found):   # 重新載入後仍對不上的列不寫入，視為找不到
+                    print(f"⚠️ {self.title} 找不到與索引一致的 {key} 資料列，不寫入")
+                    del found[key]
+
+            try:
+                written = patch_rows(self.title, {pos + 2: updates[key] for key, pos in found.items()},
+                                     header_columns(self._headers), value_input_option)
+            except Exception as e:
+                print(f"⚠️ {self.title} 批次更新失敗: {e}")
+                self.invalidate()
+                raise
+            for key, pos in found.items():
+                record = self._records[pos]
+                for name in written[pos + 2]:
+                    record[name] = _as_read_back(updates[key][name])
+            self._reindex()
+            return [key for key in updates if key not in found]
+
+    def delete(self, key, field=None):
+        with self._lock:
+            if sheet_mirror.synced(self.title):
+                self._ensure()
+                return sheet_mirror.delete(self.title, key, key_field=self._header(field or self.key))
+            ws = get_worksheet(self.title)
+            pos, row = self._locate(ws, key, field)
+            if pos is None:
+                return False
+            try:
+                ws.delete_rows(row)
+            except Exception as e:
+                print(f"⚠️ {self.title} 第 {row} 列刪除失敗: {e}")
+                self.invalidate()
+                raise
+            del self._records[pos]   # 後面各列列號往前移一列
+            self._reindex()
+            return True
+
+    def append(self, key, data):
+        self.append_many([(key, data)])
+
+    def append_many(self, items):
+        """ items 為 [(key, {欄名: 值})]，依第 1 列欄位排成資料列後以一次 append_rows 新增 """
+        with self._lock:
+            synced = sheet_mirror.synced(self.title)
+            ws = None if synced else get_worksheet(self.title)
+            headers = self.headers() if synced else ws.row_values(1)
+            new_rows = []
+            for key, data in items:
+                new_row = [""] * len(headers)
+
+                for field, value in data.items():
+                    field = _match(headers, field)
+                    if field in headers:
+                        new_row[headers.index(field)] = value
+
+                key_field = _match(headers, self.key)
+                if key is not None and key_field in headers:
+                    new_row[headers.index(key_field)] = key
+                new_rows.append(new_row)
+
+            if not new_rows:
+                return
+            if synced:
+                sheet_mirror.append_rows(self.title, new_rows)
+            elif len(new_rows) == 1:
+                ws.append_row(new_rows[0])
+            else:
+                ws.append_rows(new_rows)
+            self.invalidate()
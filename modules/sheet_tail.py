@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+
+from modules.gsheet import get_worksheet
+from modules.sheet_sync import sheet_mirror
+
+SHEET_TAIL_TTL = int(os.environ.get('SHEET_TAIL_TTL_SECONDS', 10))
+SHEET_TAIL_REBUILD = int(os.environ.get('SHEET_TAIL_REBUILD_SECONDS', 3600))
+
+
+def _pad(row, width):
+    row = list(row)
+    return row + [""] * (width - len(row)) if len(row) < width else row[:width]
+
+
+# ====== 只往下追加的分頁：增量讀取 + 彙總 ======
+class SheetTail:
+    """
+    記住已讀到第幾列與最後一列內容，之後只讀「最後一列起」的範圍：
+    重疊的那一列用來確認分頁沒有被刪列/改列，一致時把新的資料列（同 get_all_records 格式）交給
+    fold(state, records) 併入快取的彙總結果；不一致、或超過 rebuild 秒數時整張重讀一次。
+    分頁已由 sheet_mirror 鏡像時改從本地 SQLite 讀取。
+    """
+
+    def __init__(self, title, fold, ttl=SHEET_TAIL_TTL, rebuild=SHEET_TAIL_REBUILD):
+        self.title = title
+        self.fold = fold
+        self.ttl = ttl
+        self.rebuild = rebuild
+        self._headers = []
+        self._row_count = 0          # 已讀入的列數（含標題列）
+        self._last_row = None
+        self._state = None
+        self._checked_at = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def expire(self):
+        """ 本程式剛寫入時呼叫，下次 state() 立即讀取新列 """
+        self._checked_at = None
+
+    def _records(self, rows):
+        from gspread.utils import numericise_all
+        width = len(self._headers)
+        return [dict(zip(self._headers, numericise_all(_pad(r, width)))) for r in rows]
+
+    def _full(self):
+        values = sheet_mirror.values(self.title)   # 未鏡像時即 get_all_values()
+        self._headers = list(values[0]) if values else []
+        self._row_count = len(values)
+        self._last_row = _pad(values[-1], len(self._headers)) if values else None
+        self._state = self.fold(None, self._records(values[1:]))
+        self._built_at = time.monotonic()
+
+    def _read_from(self, row_num):
+        """ 第 row_num 列（含）以後的內容 """
+        if sheet_mirror.synced(self.title):
+            headers, rows = sheet_mirror.values_from(self.title, row_num)
+            return ([headers] if row_num == 1 else []) + rows
+        from gspread.utils import rowcol_to_a1
+        last_col = rowcol_to_a1(1, max(len(self._headers), 1)).rstrip('1')
+        return get_worksheet(self.title).get(f"A{row_num}:{last_col}")
+
+    def _tail(self):
+        """ 增量讀取；分頁內容與記憶的不一致時回傳 False """
+        if not self._row_count:
+            return False
+        rows = self._read_from(self._row_count)
+        if not rows or _pad(rows[0], len(self._headers)) != self._last_row:
+            return False
+        new_rows = rows[1:]
+        if new_rows:
+            self._state = self.fold(self._state, self._records(new_rows))
+            self._row_count += len(new_rows)
+            self._last_row = _pad(new_rows[-1], len(self._headers))
+        return True
+
+    def state(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._built_at is None or now - self._built_at > self.rebuild:
+                self._full()
+            elif self._checked_at is None or now - self._checked_at > self.ttl:
+                if not self._tail():
+                    print(f"🔄 {self.title} 分頁內容有非追加的變動，重新讀取整張表")
+                    self._full()
+            self._checked_at = now
+            return self._state
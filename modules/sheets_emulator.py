@@ -0,0 +1,563 @@
+"""
+本機 Google Sheets 模擬器：離線壓測 / 量測 Sheets 相關頁面用。
+
+SHEETS_BACKEND=emulator 時 modules.gsheet 改以 gspread.authorize(None, session=EmulatorSession())
+建立 client：gspread 本身的 Spreadsheet / Worksheet 程式碼照常執行，只有送出的 HTTP 請求
+由本模組在 SQLite（SHEETS_EMULATOR_DB，預設 sheets_emulator.db）上模擬 Sheets API v4 回應，
+因此 get_all_records() 的數字轉換、APIError 等行為都與正式環境相同。
+
+可注入延遲與配額：
+    SHEETS_EMULATOR_LATENCY_MS          每個請求固定延遲（預設 0）
+    SHEETS_EMULATOR_JITTER_MS           額外隨機延遲上限（預設 0）
+    SHEETS_EMULATOR_READ_PER_MINUTE     每分鐘讀取上限，超過回 429（預設 0 = 不限）
+    SHEETS_EMULATOR_WRITE_PER_MINUTE    每分鐘寫入上限，超過回 429（預設 0 = 不限）
+    SHEETS_EMULATOR_ERROR_RATE          隨機回 503 的比例（預設 0）
+
+建立資料：
+    python -m modules.sheets_emulator seed                 # 由 billing.db 建立 contracts / customers 與其他分頁標題列
+    python -m modules.sheets_emulator seed --json data.json
+    python -m modules.sheets_emulator export --json data.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import unquote
+
+from requests.models import Response
+
+EMULATOR_DB = os.environ.get('SHEETS_EMULATOR_DB', 'sheets_emulator.db')
+LATENCY_MS = float(os.environ.get('SHEETS_EMULATOR_LATENCY_MS', 0))
+JITTER_MS = float(os.environ.get('SHEETS_EMULATOR_JITTER_MS', 0))
+READ_PER_MINUTE = int(os.environ.get('SHEETS_EMULATOR_READ_PER_MINUTE', 0))
+WRITE_PER_MINUTE = int(os.environ.get('SHEETS_EMULATOR_WRITE_PER_MINUTE', 0))
+ERROR_RATE = float(os.environ.get('SHEETS_EMULATOR_ERROR_RATE', 0))
+
+API_BASE = 'https://sheets.googleapis.com/v4/spreadsheets/'
+DEFAULT_ROWS, DEFAULT_COLS = 1000, 26
+
+# seed 時建立的分頁標題列（與 app.py / billing.py 寫入的欄位順序一致）
+SEED_HEADERS = {
+    'log': ['id', 'username', 'ip_address', 'login_date', 'login_time', 'created_at'],
+    '硬碟統計': ['user', 'sc_128_new', 'sc_128_old', 'sc_240_new', 'sc_240_old', 'sc_256_new', 'sc_256_old',
+             'sc_500_new', 'sc_500_old', 'sc_1t_new', 'sc_1t_old', 'tm_128_new', 'tm_128_old',
+             'tm_256_new', 'tm_256_old'],
+    '硬碟檢測': ['台芝工作案號', '離場時間', '門店編號', '門店名稱', '報修類別', '工作內容', 'SC(1)', 'SC(2)', 'TM(1)', 'TM(2)'],
+}
+PERSON_HEADERS = ['設備代號', '備註', '抄表方式']
+
+
+class EmulatorError(Exception):
+    def __init__(self, code, message, status):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+# ====== 儲存格值 ======
+_NUMBER = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+
+def _entered(value, option):
+    """ 依 valueInputOption 轉成儲存的值（RAW 原樣保存，USER_ENTERED 解析數字 / 布林） """
+    if value is None:
+        return None
+    if option != 'USER_ENTERED' or not isinstance(value, str):
+        return value
+    text = value.strip()
+    if value.startswith("'"):
+        return value[1:]
+    if _NUMBER.match(text.replace(',', '')):
+        number = float(text.replace(',', ''))
+        return int(number) if number.is_integer() and 'e' not in text.lower() and '.' not in text else number
+    if text.upper() in ('TRUE', 'FALSE'):
+        return text.upper() == 'TRUE'
+    return value
+
+
+def _formatted(value):
+    """ FORMATTED_VALUE：Sheets 預設數字格式的顯示文字 """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return ('%.10f' % value).rstrip('0').rstrip('.')
+    return str(value)
+
+
+def _render(value, option):
+    if option == 'UNFORMATTED_VALUE':
+        return '' if value is None else value
+    return _formatted(value)
+
+
+def _empty(value):
+    return value is None or value == ''
+
+
+# ====== A1 範圍 ======
+def _split_range(range_name):
+    """ "'log'!A1:F" → ('log', 'A1:F')；只有分頁名稱時範圍為 None """
+    if '!' in range_name:
+        title, _, cells = range_name.rpartition('!')
+    else:
+        title, cells = range_name, None
+    if len(title) >= 2 and title[0] == title[-1] == "'":
+        title = title[1:-1].replace("''", "'")
+    return title, cells
+
+
+def _quote_title(title):
+    return title if re.match(r'^[A-Za-z0-9_]+$', title) else "'" + title.replace("'", "''") + "'"
+
+
+class _Sheet:
+    def __init__(self, sheet_id, title, index, row_count, col_count, values):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.index = index
+        self.row_count = row_count
+        self.col_count = col_count
+        self.values = values
+
+    def properties(self):
+        return {
+            'sheetId': self.sheet_id, 'title': self.title, 'index': self.index, 'sheetType': 'GRID',
+            'gridProperties': {'rowCount': self.row_count, 'columnCount': self.col_count},
+        }
+
+    def bounds(self, cells):
+        """ 回傳 0 起算的 (起列, 迄列, 起欄, 迄欄)（迄為開區間），超出格線回 400 """
+        from gspread.utils import a1_range_to_grid_range
+
+        if not cells:
+            return 0, self.row_count, 0, self.col_count
+        grid = a1_range_to_grid_range(cells)
+        r1 = grid.get('startRowIndex', 0)
+        r2 = grid.get('endRowIndex', self.row_count)
+        c1 = grid.get('startColumnIndex', 0)
+        c2 = grid.get('endColumnIndex', self.col_count)
+        if r1 >= self.row_count or c1 >= self.col_count or r2 > self.row_count or c2 > self.col_count:
+            raise EmulatorError(
+                400, f"Range ('{self.title}'!{cells}) exceeds grid limits. "
+                     f"Max rows: {self.row_count}, max columns: {self.col_count}", 'INVALID_ARGUMENT')
+        return r1, r2, c1, c2
+
+    def a1(self, r1, r2, c1, c2):
+        from gspread.utils import rowcol_to_a1
+        return f"{_quote_title(self.title)}!{rowcol_to_a1(r1 + 1, c1 + 1)}:{rowcol_to_a1(r2, c2)}"
+
+    def read(self, cells, render):
+        r1, r2, c1, c2 = self.bounds(cells)
+        out = []
+        for row in self.values[r1:r2]:
+            cells_out = [_render(v, render) for v in row[c1:c2]]
+            while cells_out and _empty(cells_out[-1]):
+                cells_out.pop()
+            out.append(cells_out)
+        while out and not out[-1]:
+            out.pop()
+        return self.a1(r1, r2, c1, c2), out
+
+    def write(self, r1, c1, rows, option):
+        if r1 + len(rows) > self.row_count or c1 + max((len(r) for r in rows), default=0) > self.col_count:
+            raise EmulatorError(400, f"Range exceeds grid limits of '{self.title}'", 'INVALID_ARGUMENT')
+        for i, row in enumerate(rows):
+            while len(self.values) <= r1 + i:
+                self.values.append([])
+            target = self.values[r1 + i]
+            for j, value in enumerate(row):
+                while len(target) <= c1 + j:
+                    target.append(None)
+                target[c1 + j] = _entered(value, option)
+
+    def last_row(self):
+        for i in range(len(self.values) - 1, -1, -1):
+            if any(not _empty(v) for v in self.values[i]):
+                return i + 1
+        return 0
+
+
+# ====== 以 SQLite 保存的試算表 ======
+class EmulatorStore:
+    def __init__(self, db_file=EMULATOR_DB):
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        conn = sqlite3.connect(self.db_file, timeout=10)
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS emu_sheets (
+                    spreadsheet_id TEXT NOT NULL,
+                    sheet_id INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    col_count INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (spreadsheet_id, sheet_id)
+                );
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=10)
+
+    def load(self, conn, spreadsheet_id):
+        rows = conn.execute(
+            "SELECT sheet_id, title, position, row_count, col_count, data FROM emu_sheets "
+            "WHERE spreadsheet_id = ? ORDER BY position", (spreadsheet_id,)
+        ).fetchall()
+        return [_Sheet(sid, title, pos, rc, cc, json.loads(data)) for sid, title, pos, rc, cc, data in rows]
+
+    def save(self, conn, spreadsheet_id, sheets):
+        for s in sheets:
+            conn.execute(
+                "INSERT OR REPLACE INTO emu_sheets (spreadsheet_id, sheet_id, title, position, row_count, col_count, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (spreadsheet_id, s.sheet_id, s.title, s.index, s.row_count, s.col_count,
+                 json.dumps(s.values, ensure_ascii=False))
+            )
+
+    def transaction(self, spreadsheet_id, write, func):
+        """ 以一次交易讀出整份試算表交給 func(sheets)，write 時寫回 """
+        with self._lock:
+            conn = self._connect()
+            try:
+                if write:
+                    conn.execute("BEGIN IMMEDIATE")
+                sheets = self.load(conn, spreadsheet_id)
+                if not sheets:
+                    raise EmulatorError(404, 'Requested entity was not found.', 'NOT_FOUND')
+                result = func(sheets)
+                if write:
+                    conn.execute("DELETE FROM emu_sheets WHERE spreadsheet_id = ?", (spreadsheet_id,))
+                    self.save(conn, spreadsheet_id, sheets)
+                    conn.commit()
+                return result
+            except Exception:
+                if write:
+                    conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+    def put_sheet(self, spreadsheet_id, title, values):
+        """ 建立或覆寫一個分頁（seed 用） """
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    existing = self.load(conn, spreadsheet_id)
+                    sheet = next((s for s in existing if s.title == title), None)
+                    if sheet is None:
+                        sheet = _Sheet(max([s.sheet_id for s in existing], default=0) + 1, title, len(existing),
+                                       DEFAULT_ROWS, DEFAULT_COLS, [])
+                        existing.append(sheet)
+                    sheet.values = [list(r) for r in values]
+                    sheet.row_count = max(DEFAULT_ROWS, len(values))
+                    sheet.col_count = max(DEFAULT_COLS, max((len(r) for r in values), default=0))
+                    conn.execute("DELETE FROM emu_sheets WHERE spreadsheet_id = ?", (spreadsheet_id,))
+                    self.save(conn, spreadsheet_id, existing)
+            finally:
+                conn.close()
+
+    def export(self, spreadsheet_id):
+        conn = self._connect()
+        try:
+            return {s.title: [[_formatted(v) for v in r] for r in s.values] for s in self.load(conn, spreadsheet_id)}
+        finally:
+            conn.close()
+
+
+def _find(sheets, title):
+    sheet = next((s for s in sheets if s.title == title), None)
+    if sheet is None:
+        raise EmulatorError(400, f'Unable to parse range: {title}', 'INVALID_ARGUMENT')
+    return sheet
+
+
+# ====== Sheets API v4 端點 ======
+class SheetsApiEmulator:
+    """ 依 URL / 方法分派到各端點，回傳 (HTTP 狀態碼, JSON) """
+
+    def __init__(self, store):
+        self.store = store
+
+    def handle(self, method, url, params, body):
+        path = url[len(API_BASE):] if url.startswith(API_BASE) else None
+        if path is None:
+            raise EmulatorError(404, f'Emulator does not serve {url}', 'NOT_FOUND')
+        params = params or {}
+        body = body or {}
+
+        if path.endswith(':batchUpdate') and '/values' not in path:
+            return self.batch_update(path[:-len(':batchUpdate')], body)
+        spreadsheet_id, _, rest = path.partition('/')
+        if not rest:
+            return self.metadata(spreadsheet_id)
+        if rest == 'values:batchGet':
+            ranges = params.get('ranges', [])
+            return self.values_batch_get(spreadsheet_id, [ranges] if isinstance(ranges, str) else ranges, params)
+        if rest == 'values:batchUpdate':
+            return self.values_batch_update(spreadsheet_id, body)
+        if rest.startswith('values/'):
+            range_name = unquote(rest[len('values/'):])
+            if range_name.endswith(':append'):
+                return self.values_append(spreadsheet_id, range_name[:-len(':append')], params, body)
+            if method == 'get':
+                return self.values_get(spreadsheet_id, range_name, params)
+            if method == 'put':
+                return self.values_update(spreadsheet_id, range_name, params, body)
+        raise EmulatorError(400, f'Emulator does not support {method.upper()} {path}', 'INVALID_ARGUMENT')
+
+    def metadata(self, spreadsheet_id):
+        def run(sheets):
+            return {
+                'spreadsheetId': spreadsheet_id,
+                'properties': {'title': 'emulator', 'locale': 'zh_TW', 'timeZone': 'Asia/Taipei'},
+                'sheets': [{'properties': s.properties()} for s in sheets],
+            }
+        return self.store.transaction(spreadsheet_id, False, run)
+
+    def _get(self, sheets, range_name, params):
+        title, cells = _split_range(range_name)
+        a1, values = _find(sheets, title).read(cells, params.get('valueRenderOption', 'FORMATTED_VALUE'))
+        major = params.get('majorDimension', 'ROWS')
+        if major == 'COLUMNS' and values:   # col_values 以欄為主讀取
+            width = max(len(r) for r in values)
+            values = [[r[c] if c < len(r) else '' for r in values] for c in range(width)]
+            while values and not any(v != '' for v in values[-1]):
+                values.pop()
+            for col in values:
+                while col and col[-1] == '':
+                    col.pop()
+        result = {'range': a1, 'majorDimension': major}
+        if values:
+            result['values'] = values
+        return result
+
+    def values_get(self, spreadsheet_id, range_name, params):
+        return self.store.transaction(spreadsheet_id, False, lambda sheets: self._get(sheets, range_name, params))
+
+    def values_batch_get(self, spreadsheet_id, ranges, params):
+        def run(sheets):
+            return {'spreadsheetId': spreadsheet_id,
+                    'valueRanges': [self._get(sheets, r, params) for r in ranges]}
+        return self.store.transaction(spreadsheet_id, False, run)
+
+    def _update(self, sheets, range_name, values, option):
+        title, cells = _split_range(range_name)
+        sheet = _find(sheets, title)
+        r1, _, c1, _ = sheet.bounds(cells)
+        sheet.write(r1, c1, values, option)
+        width = max((len(r) for r in values), default=0)
+        return {'updatedRange': sheet.a1(r1, r1 + len(values), c1, c1 + width),
+                'updatedRows': len(values), 'updatedColumns': width,
+                'updatedCells': sum(len(r) for r in values)}
+
+    def values_update(self, spreadsheet_id, range_name, params, body):
+        option = params.get('valueInputOption', 'RAW')
+
+        def run(sheets):
+            result = self._update(sheets, range_name, body.get('values', []), option)
+            result['spreadsheetId'] = spreadsheet_id
+            return result
+        return self.store.transaction(spreadsheet_id, True, run)
+
+    def values_batch_update(self, spreadsheet_id, body):
+        option = body.get('valueInputOption', 'RAW')
+
+        def run(sheets):
+            responses = [self._update(sheets, d['range'], d.get('values', []), option) for d in body.get('data', [])]
+            return {'spreadsheetId': spreadsheet_id,
+                    'totalUpdatedRows': sum(r['updatedRows'] for r in responses),
+                    'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+                    'responses': responses}
+        return self.store.transaction(spreadsheet_id, True, run)
+
+    def values_append(self, spreadsheet_id, range_name, params, body):
+        option = params.get('valueInputOption', 'RAW')
+
+        def run(sheets):
+            title, _ = _split_range(range_name)
+            sheet = _find(sheets, title)
+            values = body.get('values', [])
+            start = sheet.last_row()
+            if params.get('insertDataOption') == 'INSERT_ROWS':
+                sheet.row_count += len(values)
+            else:
+                sheet.row_count = max(sheet.row_count, start + len(values))   # 附加超出格線時自動擴充
+            sheet.col_count = max(sheet.col_count, max((len(r) for r in values), default=0))
+            sheet.write(start, 0, values, option)
+            width = max((len(r) for r in values), default=0)
+            return {'spreadsheetId': spreadsheet_id,
+                    'tableRange': sheet.a1(0, max(start, 1), 0, max(width, 1)),
+                    'updates': {'spreadsheetId': spreadsheet_id,
+                                'updatedRange': sheet.a1(start, start + len(values), 0, width),
+                                'updatedRows': len(values), 'updatedColumns': width,
+                                'updatedCells': sum(len(r) for r in values)}}
+        return self.store.transaction(spreadsheet_id, True, run)
+
+    def batch_update(self, spreadsheet_id, body):
+        def run(sheets):
+            replies = []
+            for req in body.get('requests', []):
+                if 'deleteDimension' in req:
+                    rng = req['deleteDimension']['range']
+                    sheet = next(s for s in sheets if s.sheet_id == rng['sheetId'])
+                    start, end = rng['startIndex'], rng['endIndex']
+                    if rng['dimension'] == 'ROWS':
+                        del sheet.values[start:end]
+                        sheet.row_count -= min(end, sheet.row_count) - start
+                    else:
+                        for row in sheet.values:
+                            del row[start:end]
+                        sheet.col_count -= min(end, sheet.col_count) - start
+                    replies.append({})
+                elif 'addSheet' in req:
+                    props = req['addSheet'].get('properties', {})
+                    if any(s.title == props.get('title') for s in sheets):
+                        raise EmulatorError(400, f"A sheet with the name \"{props.get('title')}\" already exists.",
+                                            'INVALID_ARGUMENT')
+                    grid = props.get('gridProperties', {})
+                    sheet = _Sheet(max([s.sheet_id for s in sheets], default=0) + 1, props.get('title'),
+                                   len(sheets), grid.get('rowCount', DEFAULT_ROWS),
+                                   grid.get('columnCount', DEFAULT_COLS), [])
+                    sheets.append(sheet)
+                    replies.append({'addSheet': {'properties': sheet.properties()}})
+                else:
+                    raise EmulatorError(400, f'Emulator does not support request {list(req)}', 'INVALID_ARGUMENT')
+            return {'spreadsheetId': spreadsheet_id, 'replies': replies}
+        return self.store.transaction(spreadsheet_id, True, run)
+
+
+# ====== requests.Session 替身（延遲 / 配額 / 錯誤注入） ======
+class EmulatorSession:
+    """
+    交給 gspread.authorize(None, session=...) 使用的 session：
+    request() 不連網，改由 SheetsApiEmulator 產生回應；stats 記錄各類請求次數供壓測報告使用。
+    """
+
+    def __init__(self, store=None, latency_ms=LATENCY_MS, jitter_ms=JITTER_MS,
+                 read_per_minute=READ_PER_MINUTE, write_per_minute=WRITE_PER_MINUTE, error_rate=ERROR_RATE):
+        self.api = SheetsApiEmulator(store or EmulatorStore())
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.limits = {'read': read_per_minute, 'write': write_per_minute}
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self.headers = {}
+        self._windows = {'read': deque(), 'write': deque()}
+        self._lock = threading.Lock()
+
+    def _over_quota(self, kind):
+        limit = self.limits[kind]
+        if not limit:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows[kind]
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if len(window) >= limit:
+                return True
+            window.append(now)
+            return False
+
+    def request(self, method, url, params=None, data=None, json=None, files=None, headers=None, timeout=None):
+        method = method.lower()
+        kind = 'read' if method == 'get' else 'write'
+        self.stats[kind] += 1
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+        try:
+            if self._over_quota(kind):
+                raise EmulatorError(
+                    429, f"Quota exceeded for quota metric '{kind.title()} requests' (emulator)", 'RESOURCE_EXHAUSTED')
+            if self.error_rate and random.random() < self.error_rate:
+                raise EmulatorError(503, 'The service is currently unavailable. (emulator)', 'UNAVAILABLE')
+            status, payload = 200, self.api.handle(method, url, params, json)
+        except EmulatorError as e:
+            self.stats[e.code] += 1
+            status, payload = e.code, {'error': {'code': e.code, 'message': e.message, 'status': e.status}}
+        return _response(status, payload, url)
+
+    def close(self):
+        pass
+
+
+def _response(status, payload, url):
+    resp = Response()
+    resp.status_code = status
+    resp._content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    resp.headers['Content-Type'] = 'application/json; charset=UTF-8'
+    resp.encoding = 'utf-8'
+    resp.url = url
+    return resp
+
+
+def emulator_client():
+    import gspread
+    return gspread.authorize(None, session=EmulatorSession())
+
+
+# ====== 建立 / 匯出資料 ======
+def seed_from_db(store, spreadsheet_id, db_file='billing.db', person_tabs=()):
+    conn = sqlite3.connect(db_file)
+    try:
+        for table in ('contracts', 'customers'):
+            cur = conn.execute(f'SELECT * FROM "{table}"')
+            headers = [d[0] for d in cur.description]
+            store.put_sheet(spreadsheet_id, table, [headers] + [list(r) for r in cur.fetchall()])
+    finally:
+        conn.close()
+    for title, headers in SEED_HEADERS.items():
+        store.put_sheet(spreadsheet_id, title, [headers])
+    for title in person_tabs:
+        store.put_sheet(spreadsheet_id, title, [PERSON_HEADERS])
+
+
+def main():
+    from modules.gsheet import SHEET_ID
+    from modules.sheet_sync import PERSON_TABS
+
+    parser = argparse.ArgumentParser(description='本機 Google Sheets 模擬器資料')
+    parser.add_argument('command', choices=['seed', 'export'])
+    parser.add_argument('--json', help='seed：由 {分頁: [[...], ...]} 建立；export：輸出到此檔案')
+    parser.add_argument('--db', default='billing.db', help='seed 時讀取 contracts / customers 的資料庫')
+    parser.add_argument('--emulator-db', default=EMULATOR_DB)
+    args = parser.parse_args()
+
+    store = EmulatorStore(args.emulator_db)
+    if args.command == 'seed':
+        if args.json:
+            with open(args.json, encoding='utf-8') as f:
+                for title, values in json.load(f).items():
+                    store.put_sheet(SHEET_ID, title, values)
+        else:
+            seed_from_db(store, SHEET_ID, args.db, PERSON_TABS)
+        print(f'✅ 已建立模擬試算表 {args.emulator_db}')
+    else:
+        data = store.export(SHEET_ID)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            print(f'✅ 已匯出 {len(data)} 個分頁到 {args.json}')
+        else:
+            print(json.dumps(data, ensure_ascii=False)[:2000])
+
+
+if __name__ == '__main__':
+    main()
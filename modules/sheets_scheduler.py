@@ -0,0 +1,188 @@
+import copy
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from flask import has_request_context
+
+# ====== Google Sheets API 配額 ======
+# Sheets API 預設配額：每位使用者每分鐘讀、寫各 60 次（整個服務共用）
+SHEETS_READ_PER_MINUTE = int(os.environ.get('SHEETS_READ_PER_MINUTE', 60))
+SHEETS_WRITE_PER_MINUTE = int(os.environ.get('SHEETS_WRITE_PER_MINUTE', 60))
+# token bucket 在各行程內，gunicorn 有 N 個 worker 時每個 worker 只分到 1/N 的配額
+SHEETS_WORKERS = max(int(os.environ.get('SHEETS_WORKERS', os.environ.get('WEB_CONCURRENCY', 1))), 1)
+SHEETS_MAX_RETRIES = int(os.environ.get('SHEETS_MAX_RETRIES', 5))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 16.0
+
+INTERACTIVE, BACKGROUND = 0, 1
+
+# 單純讀取、結果只取決於參數的方法：同一分頁同參數的並行呼叫合併成一次
+READ_METHODS = {
+    'get_all_records', 'get_all_values', 'get_values', 'get', 'batch_get',
+    'row_values', 'col_values', 'cell', 'acell', 'find', 'findall',
+}
+
+
+def current_priority():
+    """ 使用者請求中的呼叫優先；背景同步、outbox 送出等執行緒為 BACKGROUND """
+    return INTERACTIVE if has_request_context() else BACKGROUND
+
+
+def _status_code(e):
+    return getattr(getattr(e, 'response', None), 'status_code', None)
+
+
+def _retry_delay(e, attempt):
+    """ 429 / 5xx 回傳重試前等待秒數（指數退避 + 抖動，有 Retry-After 時依其指定），其他錯誤回傳 None """
+    import gspread
+
+    if not isinstance(e, gspread.exceptions.APIError):
+        return None
+    code = _status_code(e)
+    if code != 429 and not (code is not None and code >= 500):
+        return None
+    retry_after = getattr(getattr(e, 'response', None), 'headers', {}).get('Retry-After')
+    try:
+        return min(float(retry_after), BACKOFF_MAX)
+    except (TypeError, ValueError):
+        return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) + random.uniform(0, BACKOFF_BASE)
+
+
+class TokenBucket:
+    """
+    每分鐘 per_minute 個 token，平均補充。
+    BACKGROUND 只在沒有 INTERACTIVE 等待、且剩餘 token 超過 reserve 時才取用，
+    背景同步不會把使用者請求的額度用光。
+    """
+
+    def __init__(self, per_minute, reserve=None):
+        self.capacity = max(per_minute, 1)
+        self.rate = self.capacity / 60.0
+        self.reserve = self.capacity // 10 if reserve is None else reserve
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._interactive_waiting = 0
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE):
+        with self._cond:
+            if priority == INTERACTIVE:
+                self._interactive_waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    need = 1 if priority == INTERACTIVE else 1 + self.reserve
+                    if self.tokens >= need and (priority == INTERACTIVE or not self._interactive_waiting):
+                        self.tokens -= 1
+                        return
+                    self._cond.wait(max((need - self.tokens) / self.rate, 0.05))
+            finally:
+                if priority == INTERACTIVE:
+                    self._interactive_waiting -= 1
+                    self._cond.notify_all()
+
+    def drain(self):
+        """ 收到 429 代表實際額度已用完（可能有其他程式共用），清空讓所有呼叫一起放慢 """
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+# ====== 所有 Sheets API 呼叫的排程器 ======
+class SheetsScheduler:
+    """
+    - 讀、寫各一個 token bucket（配額依 SHEETS_WORKERS 分給各 worker），超出配額時在本地排隊，而不是送出後吃 429；
+    - 429 / 5xx 以指數退避重試；
+    - 使用者請求優先於背景執行緒；
+    - 相同的讀取（同分頁、同方法、同參數）同時只送出一次，其他呼叫等待並取得結果複本。
+    """
+
+    def __init__(self, read_per_minute=SHEETS_READ_PER_MINUTE, write_per_minute=SHEETS_WRITE_PER_MINUTE,
+                 max_retries=SHEETS_MAX_RETRIES, workers=SHEETS_WORKERS):
+        self.buckets = {
+            'read': TokenBucket(read_per_minute // workers),
+            'write': TokenBucket(write_per_minute // workers),
+        }
+        self.max_retries = max_retries
+        self.stats = Counter()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def execute(self, kind, func, *args, **kwargs):
+        """ 取得 kind（'read' / 'write'）額度後呼叫 func，429 / 5xx 時退避重試 """
+        bucket = self.buckets[kind]
+        priority = current_priority()
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire(priority)
+            self.stats[kind] += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                if _status_code(e) == 429:
+                    bucket.drain()
+                self.stats['retry'] += 1
+                print(f"⏳ Google Sheets API 回應 {_status_code(e)}，{delay:.1f} 秒後重試（第 {attempt + 1} 次）")
+                time.sleep(delay)
+
+    def read(self, key, func, *args, **kwargs):
+        """
+        以 key 合併並行的相同讀取；只與同優先順序的呼叫合併，
+        使用者請求不會跟著排在 BACKGROUND 保留額度後面的背景讀取一起等待。
+        """
+        key = (current_priority(), key)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = self.execute('read', func, *args, **kwargs)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                followers = flight.followers
+            flight.done.set()
+        # 有其他呼叫共用同一份結果時，發起者也拿複本，避免呼叫端修改到彼此的資料
+        return copy.deepcopy(flight.result) if followers else flight.result
+
+    def call(self, title, method, func, args, kwargs):
+        """ 分頁方法呼叫：讀取走 read()（合併），其餘視為寫入 """
+        if method in READ_METHODS:
+            key = (title, method, repr(args), repr(sorted(kwargs.items())))
+            return self.read(key, func, *args, **kwargs)
+        return self.execute('write', func, *args, **kwargs)
+
+
+sheets_scheduler = SheetsScheduler()
@@ -0,0 +1,566 @@
+from datetime import date, datetime, time as dt_time, timedelta
+import hashlib
+import importlib.util
+from io import BytesIO
+import json
+import math
+import os
+import pickle
+import re
+import threading
+import time
+
+import requests
+
+from modules.lazy import lazy_import
+
+# openpyxl / pandas / pyarrow 於第一次解析或讀取時才載入，worker 啟動不必等待
+openpyxl = lazy_import('openpyxl')
+pd = lazy_import('pandas')
+if importlib.util.find_spec('pyarrow') is not None:
+    pa = lazy_import('pyarrow', on_load=lambda m: importlib.import_module('pyarrow.ipc'))
+else:  # 未安裝 pyarrow 時退回每個 worker 各自載入 pickle
+    pa = None
+
+# openpyxl.cell.cell.TYPE_ERROR / TYPE_NUMERIC（OOXML 儲存格型別代碼）
+TYPE_ERROR, TYPE_NUMERIC = 'e', 'n'
+
+
+# ====== Excel 欄位字母轉換 ======
+def col_to_index(letters):
+    """ 'A' -> 0, 'AE' -> 30 """
+    idx = 0
+    for ch in letters.strip().upper():
+        idx = idx * 26 + (ord(ch) - ord('A') + 1)
+    return idx - 1
+
+
+def parse_usecols(usecols):
+    """
+    將 read_excel 風格的 usecols（例如 "A:E"、"A,B,S"、"W:AE"）轉為欄位索引清單。
+    非字串（None 或已是清單）則原樣回傳。
+    """
+    if not isinstance(usecols, str):
+        return usecols
+    cols = []
+    for part in usecols.split(','):
+        if ':' in part:
+            start, end = part.split(':')
+            cols.extend(range(col_to_index(start), col_to_index(end) + 1))
+        else:
+            cols.append(col_to_index(part))
+    return cols
+
+
+def parse_a1(ref):
+    """
+    解析 A1 範圍：'A5:E6' -> (0, 4, 4, 5)（欄、列皆為 0 起算）。
+    結束列可省略表示讀到最後一列（'A23:E' -> (0, 22, 4, None)），單格 'G1' 亦可。
+    """
+    m = re.fullmatch(r'([A-Za-z]+)(\d+)(?::([A-Za-z]+)(\d*))?', ref.strip())
+    if not m:
+        raise ValueError(f"無效的 A1 範圍：{ref}")
+    c0, r0, c1, r1 = m.groups()
+    col_start, row_start = col_to_index(c0), int(r0) - 1
+    if c1 is None:
+        return col_start, row_start, col_start, row_start
+    return col_start, row_start, col_to_index(c1), (int(r1) - 1 if r1 else None)
+
+
+# ====== 儲存格轉換（與 pandas openpyxl reader 相同規則） ======
+def _convert_cell(cell):
+    if cell.value is None:
+        return ""
+    elif cell.data_type == TYPE_ERROR:
+        return float('nan')
+    elif cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    return cell.value
+
+
+def _sheet_to_grid(ws):
+    """ 將單一工作表解碼為二維儲存格陣列（去除尾端空白列，並補齊寬度） """
+    ws.reset_dimensions()
+    grid = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(ws.rows):
+        converted = [_convert_cell(cell) for cell in row]
+        while converted and converted[-1] == "":
+            converted.pop()
+        if converted:
+            last_row_with_data = row_number
+        grid.append(converted)
+    grid = grid[:last_row_with_data + 1]
+    if grid:
+        width = max(len(r) for r in grid)
+        grid = [r + [""] * (width - len(r)) for r in grid]
+    return grid
+
+
+def _trim_block(rows):
+    """ 依區塊實際使用範圍裁切尾端空白列與空白欄（對齊 read_excel 只讀部分列時的行為） """
+    last = -1
+    width = 0
+    for i, r in enumerate(rows):
+        w = len(r)
+        while w and r[w - 1] == "":
+            w -= 1
+        if w:
+            last = i
+            width = max(width, w)
+    return [r[:width] for r in rows[:last + 1]]
+
+
+# ====== 活頁簿快照 ======
+class WorkbookSnapshot:
+    """
+    活頁簿的記憶體快照：每個分頁在建立時只解碼一次成二維儲存格陣列，
+    之後各路由以 read_excel() 切片取得 DataFrame，不再重新解析 openpyxl XML。
+    """
+
+    def __init__(self, sheets, version=None):
+        self.sheets = sheets              # {分頁名稱: [[cell, ...], ...] 或 ArrowGrid}
+        self.sheet_names = list(sheets)
+        self.version = version
+        self._derived = {}
+        self._derived_lock = threading.RLock()  # builder 內可再呼叫 derive() 取用其他衍生資料
+
+    def derive(self, key, builder):
+        """
+        取得依此版本建立的衍生資料（例如搜尋索引），每個版本只呼叫 builder(snapshot) 一次。
+        快照被新版本替換時，衍生資料隨之失效。
+        """
+        if key not in self._derived:
+            with self._derived_lock:
+                if key not in self._derived:
+                    self._derived[key] = builder(self)
+        return self._derived[key]
+
+    @classmethod
+    def from_bytes(cls, content):
+        wb = openpyxl.load_workbook(BytesIO(content), read_only=True, data_only=True, keep_links=False)
+        try:
+            sheets = {ws.title: _sheet_to_grid(ws) for ws in wb.worksheets}
+        finally:
+            wb.close()
+        return cls(sheets)
+
+    @classmethod
+    def from_path(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def grid(self, sheet_name=0):
+        if isinstance(sheet_name, int):
+            sheet_name = self.sheet_names[sheet_name]
+        if sheet_name not in self.sheets:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        return self.sheets[sheet_name]
+
+    def read_excel(self, sheet_name=0, header=0, usecols=None, skiprows=None, nrows=None):
+        """
+        與 pd.read_excel(xls, sheet_name=..., header=..., usecols=..., skiprows=..., nrows=...)
+        相同語意，但直接從已解碼的儲存格陣列切片。
+        """
+        rows = self.grid(sheet_name)
+        skip = skiprows or 0
+        if nrows is not None:
+            # 只取需要的列（與 read_excel 的 file_rows_needed 相同）
+            needed = skip + nrows + (header + 1 if header is not None else 0)
+            rows = _trim_block(rows[:needed])
+        elif not isinstance(rows, list):
+            rows = rows[:]
+        if not rows:
+            return pd.DataFrame()
+        from pandas.io.parsers import TextParser
+        parser = TextParser(
+            rows,
+            header=header,
+            skiprows=skiprows,
+            nrows=nrows,
+            usecols=parse_usecols(usecols),
+            skip_blank_lines=False,
+        )
+        return parser.read(nrows=nrows)
+
+    def read_range(self, sheet_name, ref, header=True, records=False):
+        """
+        以 A1 範圍取出區塊，例如 read_range('首頁', 'A5:E6')。
+        header=True 時範圍第一列為欄名；header=False 時回傳原始儲存格（欄名為 0..n）。
+        records=True 時回傳 list[dict]。
+        """
+        col_start, row_start, col_end, row_end = parse_a1(ref)
+        nrows = None
+        if row_end is not None:
+            nrows = row_end - row_start + 1 - (1 if header else 0)
+        df = self.read_excel(
+            sheet_name=sheet_name,
+            header=0 if header else None,
+            usecols=list(range(col_start, col_end + 1)),
+            skiprows=row_start,
+            nrows=nrows,
+        )
+        return df.to_dict(orient='records') if records else df
+
+    def read_ranges(self, sheet_name, ranges):
+        """
+        一次取出同一分頁的多個具名區塊，共用同一份已解碼的儲存格陣列。
+        ranges: {名稱: 'A5:E6'} 或 {名稱: ('A21:C22', False)}（第二個值為 header）
+        """
+        blocks = {}
+        for name, spec in ranges.items():
+            ref, header = (spec, True) if isinstance(spec, str) else spec
+            blocks[name] = self.read_range(sheet_name, ref, header=header)
+        return blocks
+
+
+def sheet_version(snapshot, sheet_name='首頁', cell='G1'):
+    """ 讀取版本儲存格（預設 首頁!G1），無資料時回傳 '無版本資訊' """
+    df_version = snapshot.read_range(sheet_name, cell, header=False)
+    if df_version.empty or pd.isna(df_version.iat[0, 0]):
+        return "無版本資訊"
+    return str(df_version.iat[0, 0])
+
+
+# ====== Arrow IPC 共享快照（memory-map，多個 worker 共用同一份分頁） ======
+# 每個儲存格以 (種類, 文字) 兩欄保存，讀取時只解碼被切片到的列
+_KIND_EMPTY, _KIND_INT, _KIND_FLOAT, _KIND_STR, _KIND_DATETIME, _KIND_DATE, \
+    _KIND_TIME, _KIND_TIMEDELTA, _KIND_BOOL, _KIND_NAN = range(10)
+
+_DECODERS = {
+    _KIND_EMPTY: lambda v: "",
+    _KIND_INT: int,
+    _KIND_FLOAT: float,
+    _KIND_STR: lambda v: v,
+    _KIND_DATETIME: datetime.fromisoformat,
+    _KIND_DATE: date.fromisoformat,
+    _KIND_TIME: dt_time.fromisoformat,
+    _KIND_TIMEDELTA: lambda v: timedelta(microseconds=int(v)),
+    _KIND_BOOL: lambda v: v == '1',
+    _KIND_NAN: lambda v: float('nan'),
+}
+
+
+def _encode_cell(v):
+    if isinstance(v, str):
+        return (_KIND_EMPTY, None) if v == "" else (_KIND_STR, v)
+    if isinstance(v, bool):
+        return _KIND_BOOL, '1' if v else '0'
+    if isinstance(v, int):
+        return _KIND_INT, str(v)
+    if isinstance(v, float):
+        return (_KIND_NAN, None) if math.isnan(v) else (_KIND_FLOAT, repr(v))
+    if isinstance(v, datetime):
+        return _KIND_DATETIME, v.isoformat()
+    if isinstance(v, date):
+        return _KIND_DATE, v.isoformat()
+    if isinstance(v, dt_time):
+        return _KIND_TIME, v.isoformat()
+    if isinstance(v, timedelta):
+        return _KIND_TIMEDELTA, str(v // timedelta(microseconds=1))
+    return _KIND_STR, str(v)
+
+
+def write_arrow(sheets, path):
+    """ 將 {分頁: 儲存格陣列} 寫成單一 Arrow IPC 檔，每個分頁一個 record batch """
+    widths = [len(g[0]) if g else 0 for g in sheets.values()]
+    max_width = max(widths, default=0)
+    fields = []
+    for i in range(max_width):
+        fields += [pa.field(f'k{i}', pa.uint8()), pa.field(f'v{i}', pa.string())]
+    meta = {'sheets': list(sheets), 'widths': widths}
+    schema = pa.schema(fields, metadata={'workbook': json.dumps(meta, ensure_ascii=False)})
+
+    sink = BytesIO()
+    with pa.ipc.new_file(sink, schema) as writer:
+        for grid in sheets.values():
+            columns = []
+            for i in range(max_width):
+                encoded = [_encode_cell(r[i]) if i < len(r) else (_KIND_EMPTY, None) for r in grid]
+                columns.append(pa.array([k for k, _ in encoded], type=pa.uint8()))
+                columns.append(pa.array([v for _, v in encoded], type=pa.string()))
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+    _atomic_write(path, sink.getvalue())
+
+
+class ArrowGrid:
+    """
+    memory-map 上的單一分頁。行為如同唯讀的 list[list]，
+    但只有在切片時才把該範圍解碼成 Python 值，未讀到的頁面不佔用 worker 記憶體。
+    """
+
+    def __init__(self, batch, width):
+        self.batch = batch
+        self.width = width
+
+    def __len__(self):
+        return self.batch.num_rows
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop, step = key.indices(self.batch.num_rows)
+        if step != 1:
+            raise ValueError("ArrowGrid 僅支援連續切片")
+        part = self.batch.slice(start, max(0, stop - start))
+        columns = []
+        for i in range(self.width):
+            kinds = part.column(2 * i).to_pylist()
+            texts = part.column(2 * i + 1).to_pylist()
+            columns.append([_DECODERS[k](v) for k, v in zip(kinds, texts)])
+        return [list(r) for r in zip(*columns)] if columns else [[] for _ in range(part.num_rows)]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def read_arrow(path):
+    """ 以 memory-map 開啟 Arrow IPC 快照，回傳 {分頁: ArrowGrid} """
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    meta = json.loads(reader.schema.metadata[b'workbook'].decode('utf-8'))
+    return {
+        name: ArrowGrid(reader.get_batch(i), width)
+        for i, (name, width) in enumerate(zip(meta['sheets'], meta['widths']))
+    }
+
+
+# ====== 本地磁碟快取 ======
+DEFAULT_CACHE_DIR = os.environ.get(
+    'WORKBOOK_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.workbook_cache')
+)
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class WorkbookCache:
+    """
+    以內容為鍵的本地快取目錄：
+      <url 雜湊>.json   -> {url, etag, sha256}（該 URL 最後一次下載的版本）
+      <sha256>.arrow    -> 已解碼的各分頁（Arrow IPC，所有 worker memory-map 同一份）
+      <sha256>.pkl      -> 未安裝 pyarrow 時的替代格式（pickle，每個 worker 各自載入）
+    worker 重啟時直接從快取載入，不需 openpyxl；GitHub 只用 ETag 確認是否有新版。
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _meta_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _content_path(self, sha):
+        return os.path.join(self.cache_dir, sha + ('.arrow' if pa is not None else '.pkl'))
+
+    def load_meta(self, url):
+        try:
+            with open(self._meta_path(url), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_content(self, sha):
+        path = self._content_path(sha)
+        if not os.path.exists(path):
+            return None
+        try:
+            if pa is not None:
+                return WorkbookSnapshot(read_arrow(path))
+            with open(path, 'rb') as f:
+                return WorkbookSnapshot(pickle.load(f))
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError) as e:
+            print(f"⚠️ 本地活頁簿快取損毀，略過：{e}")
+            return None
+
+    def load(self, url):
+        """ 回傳 (snapshot, meta)；無快取時回傳 (None, None) """
+        meta = self.load_meta(url)
+        if not meta:
+            return None, None
+        snapshot = self.load_content(meta.get('sha256', ''))
+        if snapshot is None:
+            return None, None
+        return snapshot, meta
+
+    def store(self, url, etag, sha, snapshot):
+        path = self._content_path(sha)
+        if not os.path.exists(path):
+            if pa is not None:
+                write_arrow(snapshot.sheets, path)
+            else:
+                _atomic_write(path, pickle.dumps(snapshot.sheets, protocol=pickle.HIGHEST_PROTOCOL))
+        meta = {'url': url, 'etag': etag, 'sha256': sha}
+        _atomic_write(self._meta_path(url), json.dumps(meta).encode('utf-8'))
+        self._prune()
+
+    def _prune(self):
+        """ 移除已沒有任何 URL 指向的舊版本內容檔 """
+        keep = set()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.cache_dir, name), encoding='utf-8') as f:
+                        keep.add(json.load(f).get('sha256'))
+                except (OSError, ValueError):
+                    continue
+        for name in os.listdir(self.cache_dir):
+            base, ext = os.path.splitext(name)
+            if ext in ('.pkl', '.arrow') and base not in keep:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+
+# ====== GitHub 活頁簿來源（背景更新 + 原子替換） ======
+class WorkbookSource:
+    """
+    由 URL 下載活頁簿並維持目前的快照。
+    背景執行緒以 If-None-Match（ETag）定期輪詢，內容有變才在背景解析新版本，
+    解析完成後一次替換 self.snapshot，請求端永遠只讀取已完成的快照。
+    on_load(snapshot) 於替換前呼叫，可用來設定 snapshot.version 等衍生資訊。
+    cache_dir 不為 None 時，下載結果會寫入本地快取，冷啟動先從快取載入。
+    """
+
+    def __init__(self, url, timeout=5, interval=60, on_load=None, cache_dir=DEFAULT_CACHE_DIR):
+        self.url = url
+        self.timeout = timeout
+        self.interval = interval
+        self.on_load = on_load
+        self.cache = WorkbookCache(cache_dir) if cache_dir else None
+        self.snapshot = None
+        self.etag = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _swap(self, snapshot, etag):
+        if self.on_load:
+            self.on_load(snapshot)
+        self.etag = etag
+        self.snapshot = snapshot
+
+    def load_cached(self):
+        """ 從本地快取載入上次下載的版本；成功時回傳 True """
+        if not self.cache:
+            return False
+        try:
+            snapshot, meta = self.cache.load(self.url)
+        except Exception as e:
+            print(f"⚠️ 讀取本地活頁簿快取失敗: {e}")
+            return False
+        if snapshot is None:
+            return False
+        self._swap(snapshot, meta.get('etag'))
+        return True
+
+    def _download(self):
+        """ 發出一次條件式請求並解析；回傳 (快照, ETag)，304 時回傳 None。不替換 self.snapshot """
+        headers = {}
+        if self.etag and self.snapshot is not None:
+            headers['If-None-Match'] = self.etag
+        resp = requests.get(self.url, timeout=self.timeout, headers=headers)
+        if resp.status_code == 304:
+            return None
+        if resp.status_code != 200:
+            raise Exception(f"HTTP {resp.status_code}")
+
+        etag = resp.headers.get('ETag')
+        sha = hashlib.sha256(resp.content).hexdigest()
+        snapshot = self.cache.load_content(sha) if self.cache else None
+        if snapshot is None:
+            snapshot = WorkbookSnapshot.from_bytes(resp.content)
+        if self.cache:
+            try:
+                self.cache.store(self.url, etag, sha, snapshot)
+                # 改用快取檔（memory-map）版本，釋放剛解析出的私有副本
+                snapshot = self.cache.load_content(sha) or snapshot
+            except OSError as e:
+                print(f"⚠️ 寫入本地活頁簿快取失敗: {e}")
+        return snapshot, etag
+
+    def fetch(self):
+        """ 下載並替換；有新版本並替換成功時回傳 True，304 時回傳 False """
+        result = self._download()
+        if result is None:
+            return False
+        self._swap(*result)
+        return True
+
+    def get(self):
+        """ 取得目前快照；本行程尚無快照時先讀本地快取，沒有快取才同步下載一次 """
+        snapshot = self.snapshot
+        if snapshot is None:
+            with self._lock:
+                if self.snapshot is None and not self.load_cached():
+                    self.fetch()
+            snapshot = self.snapshot
+        self.start_refresher()
+        return snapshot
+
+    def start_refresher(self):
+        """ 啟動背景輪詢執行緒（每個 worker 行程各一條；fork 後會自動重新啟動） """
+        if self.interval <= 0:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                if self.snapshot is None:
+                    with self._lock:
+                        if self.snapshot is None:
+                            self.load_cached()
+                # 下載與解析不持有鎖，冷啟動的 get() 不必等背景的網路請求；只有替換快照時才上鎖
+                result = self._download()
+                if result is not None:
+                    with self._lock:
+                        self._swap(*result)
+                    print(f"🔄 已更新活頁簿：{self.url}（版本 {self.snapshot.version}）")
+            except Exception as e:
+                print(f"⚠️ 背景更新活頁簿失敗: {e}")
+            time.sleep(self.interval)
+
+
+# ====== 本機活頁簿（檔案變更才重新解析） ======
+class LocalWorkbook:
+    """
+    本機 xlsx（如 MFP/MFP.xlsx）的快照：修改時間或大小改變時才重新讀檔，
+    以內容 sha256 作為 version；內容相同（只被 touch）時沿用原快照與其衍生資料。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = None
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        st = os.stat(self.path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if self.snapshot is None or stat_key != self._stat:
+            with self._lock:
+                if self.snapshot is None or stat_key != self._stat:
+                    with open(self.path, 'rb') as f:
+                        content = f.read()
+                    sha = hashlib.sha256(content).hexdigest()
+                    if self.snapshot is None or self.snapshot.version != sha:
+                        self.snapshot = WorkbookSnapshot.from_bytes(content)
+                        self.snapshot.version = sha
+                    self._stat = stat_key
+        return self.snapshot
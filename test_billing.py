@@ -0,0 +1,82 @@
+"""
+月底批次計費的檢查（在 billing.db 的暫存複本上執行）：
+
+    python -m pytest -q test_billing.py
+"""
+import sqlite3
+
+GROUPS = {"T352500088": ["T352500089", "T352500090"], "T302800122": ["T301800079"]}
+
+
+def _devices(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return [r[0] for r in conn.execute("SELECT device_id FROM contracts ORDER BY rowid")]
+    finally:
+        conn.close()
+
+
+def _seed_month(db_file, year, month):
+    """ 每台設備寫入上月 billing_summary 累計與當月 usage 抄表數（數字固定，結果可重現） """
+    prev_year, prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    conn = sqlite3.connect(db_file)
+    with conn:
+        for i, device_id in enumerate(_devices(db_file)):
+            last = (i * 7, 1000 + i * 31, 5000 + i * 53)
+            conn.execute(
+                "INSERT OR REPLACE INTO billing_summary (device_id, month, year, color_a3_total, color_total, bw_total) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (device_id, prev_month, prev_year, *last)
+            )
+            conn.execute(
+                "INSERT INTO usage (device_id, month, color_a3_count, color_count, bw_count, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, '')",
+                (device_id, f"{year}{month:02d}", last[0] + i % 5, last[1] + 397 * (i % 9), last[2] + 2111 * (i % 13))
+            )
+    conn.close()
+
+
+# ====== 月底批次計費 ======
+def test_batch_matches_calculate_for_master_sub_groups(db_file):
+    from modules.batch_billing import load_contract_rows, run_batch
+    from modules.billing import calculate
+    from modules.db import connect
+
+    _seed_month(db_file, 2026, 7)
+    report = run_batch(2026, 7, dry_run=True, db_file=db_file)
+    billed = {device_id: (curr, last, result) for device_id, curr, last, result in report["billed"]}
+    assert not report["missing"]
+
+    conn = connect(db_file)
+    try:
+        rows = load_contract_rows(conn)
+        counts = {r[0]: r[1:] for r in conn.execute(
+            "SELECT device_id, color_a3_count, color_count, bw_count FROM usage WHERE month = '202607'")}
+        totals = {r[0]: r[1:] for r in conn.execute(
+            "SELECT device_id, color_a3_total, color_total, bw_total FROM billing_summary WHERE year = 2026 AND month = 6")}
+    finally:
+        conn.close()
+
+    for master, subs in GROUPS.items():
+        members = [master] + subs
+        curr = [sum(counts[d][i] for d in members) for i in range(3)]
+        last = [sum(totals[d][i] for d in members) for i in range(3)]
+        assert billed[master][:2] == (curr, last)
+        assert billed[master][2] == calculate(dict(rows[master]), *curr, *last)
+        for sub in subs:
+            assert sub not in billed   # 子機併入主機計費
+
+    # 其餘設備也與逐台 calculate 一致
+    for device_id, (curr, last, result) in billed.items():
+        assert result == calculate(dict(rows[device_id]), *curr, *last)
+
+
+def test_batch_keeps_fractional_giveaway(db_file):
+    from modules.batch_billing import run_batch
+
+    _seed_month(db_file, 2026, 7)
+    conn = sqlite3.connect(db_file)
+    with conn:
+        conn.execute("UPDATE contracts SET bw_giveaway = bw_giveaway + 10.5, color_basic = 7.6 WHERE rowid % 3 = 0")
+    conn.close()
+    report = run_batch(2026, 7, dry_run=True, verify=True, db_file=db_file)
+    assert report["billed"] and report["mismatch"] == []
@@ -0,0 +1,40 @@
+"""
+抄表匯入的檢查（在 billing.db 的暫存複本上執行）：
+
+    python -m pytest -q test_meter_import.py
+"""
+import sqlite3
+
+
+# ====== 抄表匯入 ======
+def test_import_rejects_incomplete_group(db_file):
+    from modules.meter_import import import_readings
+
+    conn = sqlite3.connect(db_file)
+    before = conn.execute("SELECT COUNT(*) FROM usage").fetchone()[0]
+    conn.close()
+
+    rows = [(2, "T352500088", {"color_a3": 0, "color": 100, "bw": 200}),
+            (3, "T352500089", {"color_a3": 0, "color": 100, "bw": 200})]
+    report = import_readings(rows, 2026, 7, db_file=db_file)
+
+    assert "群組 T352500088 缺少設備抄表：T352500090" in report["errors"]
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT COUNT(*) FROM usage").fetchone()[0] == before
+    conn.close()
+
+
+def test_import_writes_complete_group(db_file):
+    from modules.meter_import import import_readings
+
+    rows = [(2, "T302800122", {"color_a3": 0, "color": 100, "bw": 200}),
+            (3, "T301800079", {"color_a3": 0, "color": 50, "bw": 80})]
+    report = import_readings(rows, 2026, 7, db_file=db_file)
+
+    assert report["errors"] == []
+    conn = sqlite3.connect(db_file)
+    summary = conn.execute(
+        "SELECT color_total, bw_total FROM billing_summary WHERE device_id = 'T302800122' AND year = 2026 AND month = 7"
+    ).fetchone()
+    conn.close()
+    assert summary == (150, 280)
@@ -0,0 +1,35 @@
+"""
+資料表版本管理的檢查：
+
+    python -m pytest -q test_migrations.py
+"""
+import os
+import shutil
+import sqlite3
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ====== 資料表版本管理 ======
+def test_migrate_is_idempotent(db_file, tmp_path):
+    from modules.migrations import LATEST_VERSION, migrate
+
+    # 尚未套用過版本的原始 billing.db
+    fresh = tmp_path / "fresh.db"
+    shutil.copy(os.path.join(REPO_DIR, "billing.db"), fresh)
+    conn = sqlite3.connect(fresh)
+    counts = {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in ("contracts", "usage", "billing_summary")}
+    conn.close()
+
+    assert migrate(str(fresh)) == [v for v in range(1, LATEST_VERSION + 1)]
+    assert migrate(str(fresh)) == []
+
+    conn = sqlite3.connect(fresh)
+    try:
+        assert [r[0] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")] == \
+            list(range(1, LATEST_VERSION + 1))
+        assert {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in counts} == counts
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_contracts_master", "idx_usage_device_month", "idx_billing_summary_year_month"} <= indexes
+    finally:
+        conn.close()